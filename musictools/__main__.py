@@ -0,0 +1,3 @@
+from musictools.cli import main
+
+main()
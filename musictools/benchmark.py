@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from logging import Logger
+from pathlib import Path
+from musictools import get_logger
+from musictools.common.utils.export_writer import JSONExportWriter
+from musictools.common.utils.file_utils import get_playlists, list_titles
+from musictools.common.utils.tag_index import INDEX_FILENAME
+from musictools.common.utils.tag_reader import TagReader
+from musictools.common.value_objects.condense_manifest import CondenseManifest
+from musictools.common.value_objects.music_file import MusicFile
+from musictools.condense import plan_condense
+from musictools.config import CondenseConfig, LibraryConfig
+from musictools.export import write_library, write_playlists
+
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+GENRES = ["Soundtrack", "Rock", "Jazz", "Electronic", "Classical"]
+
+
+def _flac_bytes(seconds: int) -> bytes:
+    sample_rate = 44100
+    streaminfo = struct.pack(">HH", 4096, 4096) + bytes(6)
+    sample_info = (sample_rate << 44) | (1 << 41) | (15 << 36) | seconds * sample_rate
+    streaminfo += sample_info.to_bytes(8, "big") + bytes(16)
+    return (
+        b"fLaC"
+        + bytes([0x80])
+        + len(streaminfo).to_bytes(3, "big")
+        + streaminfo
+        + bytes(4096)
+    )
+
+
+def generate_library(
+    location: Path,
+    num_tracks: int,
+    num_playlists: int,
+    playlist_size: int,
+    seed: int = 0,
+) -> list[Path]:
+    from mutagen.flac import FLAC
+    from mutagen.id3 import ID3, TALB, TCON, TIT2, TPE1, TRCK
+
+    rng = random.Random(seed)
+    titles: list[Path] = []
+    tracks_per_album = 12
+    for i in range(num_tracks):
+        artist = f"Artist {str(i // (tracks_per_album * 4))}"
+        album = f"Album {str(i // tracks_per_album)}"
+        track = i % tracks_per_album + 1
+        directory = location / artist / album
+        directory.mkdir(parents=True, exist_ok=True)
+        if i % 3 == 0:
+            path = directory / f"{str(track)}.flac"
+            path.write_bytes(_flac_bytes(seconds=rng.randint(60, 400)))
+            flac = FLAC(path)
+            flac["artist"] = [artist]
+            flac["album"] = [album]
+            flac["title"] = [f"Title {str(i)}"]
+            flac["track"] = [str(track)]
+            flac["genre"] = [rng.choice(GENRES)]
+            flac.save()
+        else:
+            path = directory / f"{str(track)}.mp3"
+            path.write_bytes(MP3_FRAME * 10)
+            id3 = ID3()
+            id3.add(TPE1(encoding=3, text=[artist]))
+            id3.add(TALB(encoding=3, text=[album]))
+            id3.add(TIT2(encoding=3, text=[f"Title {str(i)}"]))
+            id3.add(TRCK(encoding=3, text=[str(track)]))
+            id3.add(TCON(encoding=3, text=[rng.choice(GENRES)]))
+            id3.save(path)
+        titles.append(path)
+
+    popular = titles[: max(1, len(titles) // 10)]
+    for i in range(num_playlists):
+        size = min(playlist_size, len(titles))
+        entries = rng.sample(popular, min(len(popular), size // 2))
+        entries += rng.sample(titles, size - len(entries))
+        with open(location / f"Playlist {str(i)}.m3u", "wt") as playlist_file:
+            for entry in entries:
+                playlist_file.write(str(entry.relative_to(location)) + "\n")
+    return titles
+
+
+def benchmark_configs(
+    workdir: Path,
+    jobs: int,
+) -> tuple[LibraryConfig, CondenseConfig]:
+    library_config = LibraryConfig(
+        location=str(workdir / "library"),
+        condensed_location=str(workdir / "condensed"),
+    )
+    condense_config = CondenseConfig(
+        compress=True,
+        compression_quality=4,
+        variable_bitrate=True,
+        jobs=jobs,
+    )
+    return (library_config, condense_config)
+
+
+def export_library(
+    library: Path,
+    export_location: Path,
+    jobs: int,
+):
+    playlists = get_playlists(library)
+    with MusicFile.indexed(library):
+        tag_reader = TagReader(
+            jobs=jobs,
+            shared_paths={
+                title.path for playlist in playlists for title in playlist.content
+            },
+        )
+        try:
+            with open(export_location / "library.json", "wt") as library_file:
+                write_library(library, tag_reader, JSONExportWriter(library_file), jobs)
+            with open(export_location / "playlists.json", "wt") as playlists_file:
+                write_playlists(
+                    library, playlists, tag_reader, JSONExportWriter(playlists_file)
+                )
+        finally:
+            tag_reader.close()
+
+
+def run_stages(
+    workdir: Path,
+    jobs: int,
+) -> dict[str, Callable[[], object]]:
+    library = workdir / "library"
+    export_location = workdir / "export"
+    export_location.mkdir(exist_ok=True)
+    library_config, condense_config = benchmark_configs(workdir, jobs)
+
+    def export_cold():
+        (library / INDEX_FILENAME).unlink(missing_ok=True)
+        export_library(library, export_location, jobs)
+
+    def condense_plan():
+        plan_condense(
+            playlists=get_playlists(library),
+            manifest=CondenseManifest(path=workdir / "manifest.json", entries={}),
+            library_config=library_config,
+            condense_config=condense_config,
+        )
+
+    return {
+        "scan": lambda: list_titles(library, jobs),
+        "playlist_parse": lambda: get_playlists(library),
+        "export_cold": export_cold,
+        "export_warm": lambda: export_library(library, export_location, jobs),
+        "condense_plan": condense_plan,
+    }
+
+
+def time_stages(
+    stages: dict[str, Callable[[], object]],
+    repeat: int,
+) -> dict[str, float]:
+    timings: dict[str, float] = {}
+    for name, stage in stages.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def compare_runs(
+    previous: dict,
+    current: dict,
+    threshold: float,
+    logger: Logger,
+) -> list[str]:
+    regressions: list[str] = []
+    for name, seconds in current["stages"].items():
+        previous_seconds = previous["stages"].get(name)
+        if previous_seconds is None:
+            continue
+        change = (seconds - previous_seconds) / previous_seconds
+        logger.info(
+            f"{name:<16}{previous_seconds:>10.3f}s -> {seconds:>8.3f}s ({change:+.1%})"
+        )
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--playlists", type=int, default=50)
+    parser.add_argument("--playlist-size", type=int, default=200)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument(
+        "--results",
+        type=Path,
+        default=Path("benchmark-results.json"),
+        help="file the run is appended to and compared against",
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        help="keep the synthetic library in this directory instead of a temporary one",
+    )
+
+
+def run(args: argparse.Namespace):
+    logger = get_logger()
+    results_path = args.results.resolve()
+
+    with tempfile.TemporaryDirectory() as temporary_directory:
+        workdir = (args.workdir or Path(temporary_directory)).resolve()
+        library = workdir / "library"
+        if not library.exists():
+            logger.info(f"Generating {str(args.tracks)} synthetic title(s)...")
+            generate_library(
+                location=library,
+                num_tracks=args.tracks,
+                num_playlists=args.playlists,
+                playlist_size=args.playlist_size,
+            )
+        timings = time_stages(run_stages(workdir, args.jobs), args.repeat)
+
+    result = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "parameters": {
+            "tracks": args.tracks,
+            "playlists": args.playlists,
+            "playlist_size": args.playlist_size,
+            "jobs": args.jobs,
+        },
+        "stages": timings,
+    }
+    runs: list[dict] = []
+    if results_path.exists():
+        with open(results_path, "rt") as results_file:
+            runs = json.loads(results_file.read())
+    previous = next(
+        (r for r in reversed(runs) if r["parameters"] == result["parameters"]),
+        None,
+    )
+
+    regressions: list[str] = []
+    if previous:
+        regressions = compare_runs(previous, result, args.threshold, logger)
+    else:
+        for name, seconds in timings.items():
+            logger.info(f"{name:<16}{seconds:>10.3f}s")
+    runs.append(result)
+    with open(results_path, "wt") as results_file:
+        results_file.write(json.dumps(runs, indent=2))
+
+    if regressions:
+        logger.info(f"Regression in stage(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(prog="benchmark")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,48 @@
+import argparse
+import importlib
+from musictools.config import set_config_path
+
+COMMANDS = {
+    "condense": (
+        "musictools.condense",
+        "copy the titles of all playlists into the condensed library",
+    ),
+    "download": (
+        "musictools.download",
+        "download albums from KHInsider",
+    ),
+    "export": (
+        "musictools.export",
+        "export the library and playlists",
+    ),
+    "duplicates": (
+        "musictools.duplicates",
+        "report titles stored more than once in the library",
+    ),
+    "benchmark": (
+        "musictools.benchmark",
+        "time the core pipelines on a synthetic library",
+    ),
+}
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="musictools")
+    parser.add_argument(
+        "--config",
+        help="config file to use instead of ./config.json",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, description) in COMMANDS.items():
+        subparsers.add_parser(name, help=description, add_help=False)
+    args, command_argv = parser.parse_known_args(argv)
+    set_config_path(args.config)
+
+    module = importlib.import_module(COMMANDS[args.command][0])
+    command_parser = argparse.ArgumentParser(prog=f"musictools {args.command}")
+    module.add_arguments(command_parser)
+    module.run(command_parser.parse_args(command_argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import struct
+from pathlib import Path
+from musictools.common.value_objects.stream_info import StreamInfo
+
+PROBE_SIZE = 16 * 1024
+
+MPEG_BITRATES = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MPEG_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+
+class ProbeError(Exception): ...
+
+
+def _id3_size(header: bytes) -> int:
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _parse_mpeg_header(header: bytes) -> tuple[int, int, int, int, int, int] | None:
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer == 0 or bitrate_index in (0, 15):
+        return None
+    if sample_rate_index == 3:
+        return None
+    bitrate = MPEG_BITRATES[(3 if version == 3 else 2, layer)][bitrate_index]
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    channel_mode = header[3] >> 6
+    return (version, layer, bitrate, sample_rate, padding, channel_mode)
+
+
+def _samples_per_frame(
+    version: int,
+    layer: int,
+) -> int:
+    if layer == 3:
+        return 384
+    if layer == 1 and version != 3:
+        return 576
+    return 1152
+
+
+def probe_mp3(path: Path) -> StreamInfo:
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        audio_start = _id3_size(file.read(10))
+        file.seek(audio_start)
+        data = file.read(PROBE_SIZE)
+
+    for offset in range(len(data) - 4):
+        frame = _parse_mpeg_header(data[offset : offset + 4])
+        if frame:
+            break
+    else:
+        raise ProbeError(f"No MPEG frame found in the first {PROBE_SIZE} bytes")
+    version, layer, bitrate, sample_rate, _, channel_mode = frame
+    audio_start += offset
+    audio_size = file_size - audio_start
+    samples_per_frame = _samples_per_frame(version, layer)
+
+    if version == 3:
+        side_info_size = 17 if channel_mode == 3 else 32
+    else:
+        side_info_size = 9 if channel_mode == 3 else 17
+    xing_offset = offset + 4 + side_info_size
+    if data[xing_offset : xing_offset + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing_offset + 4 : xing_offset + 8])[0]
+        position = xing_offset + 8
+        if flags & 0x01:
+            frames = struct.unpack(">I", data[position : position + 4])[0]
+            position += 4
+            if flags & 0x02:
+                audio_size = struct.unpack(">I", data[position : position + 4])[0]
+            duration = frames * samples_per_frame / sample_rate
+            if duration > 0:
+                return StreamInfo(
+                    bitrate=audio_size * 8 / duration / 1000,
+                    duration=duration,
+                )
+
+    vbri_offset = offset + 36
+    if data[vbri_offset : vbri_offset + 4] == b"VBRI":
+        audio_size, frames = struct.unpack(
+            ">II", data[vbri_offset + 10 : vbri_offset + 18]
+        )
+        duration = frames * samples_per_frame / sample_rate
+        if duration > 0:
+            return StreamInfo(
+                bitrate=audio_size * 8 / duration / 1000,
+                duration=duration,
+            )
+
+    return StreamInfo(
+        bitrate=bitrate,
+        duration=audio_size * 8 / (bitrate * 1000),
+    )
+
+
+def probe_flac(path: Path) -> StreamInfo:
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as file:
+        position = _id3_size(file.read(10))
+        file.seek(position)
+        if file.read(4) != b"fLaC":
+            raise ProbeError("Missing FLAC stream marker")
+        position += 4
+        streaminfo = None
+        last = False
+        while not last:
+            block_header = file.read(4)
+            if len(block_header) < 4:
+                raise ProbeError("Truncated FLAC metadata")
+            last = bool(block_header[0] & 0x80)
+            block_type = block_header[0] & 0x7F
+            block_size = int.from_bytes(block_header[1:4], "big")
+            position += 4
+            if block_type == 0:
+                streaminfo = file.read(block_size)
+            else:
+                file.seek(block_size, os.SEEK_CUR)
+            position += block_size
+
+    if not streaminfo or len(streaminfo) < 18:
+        raise ProbeError("Missing FLAC STREAMINFO block")
+    sample_info = int.from_bytes(streaminfo[10:18], "big")
+    sample_rate = sample_info >> 44
+    total_samples = sample_info & 0xFFFFFFFFF
+    if not sample_rate or not total_samples:
+        raise ProbeError("FLAC STREAMINFO has no sample count")
+    duration = total_samples / sample_rate
+    return StreamInfo(
+        bitrate=(file_size - position) * 8 / duration / 1000,
+        duration=duration,
+    )
@@ -0,0 +1,102 @@
+import hashlib
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from musictools.common.utils.metrics import get_metrics
+from musictools.common.utils.tag_index import TagIndex
+from musictools.common.utils.transcode_cache import hash_file
+
+PARTIAL_HASH_SIZE = 64 * 1024
+
+
+def hash_partial(path: Path) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read(PARTIAL_HASH_SIZE)).hexdigest()
+
+
+def _digest(
+    hash_function: Callable[[Path], str],
+    path: Path,
+) -> str | None:
+    try:
+        return hash_function(path)
+    except OSError:
+        return None
+
+
+def _cached(
+    hash_function: Callable[[Path], str],
+    kind: str,
+    index: TagIndex | None,
+) -> Callable[[Path], str]:
+    if not index:
+        return hash_function
+    metrics = get_metrics()
+
+    def cached_hash_function(path: Path) -> str:
+        stat = path.stat()
+        digest = index.get_digest(path, stat, kind)
+        if digest is not None:
+            metrics.add("digest_cache_hits")
+            return digest
+        digest = hash_function(path)
+        index.put_digest(path, stat, kind, digest)
+        return digest
+
+    return cached_hash_function
+
+
+def _split(
+    groups: list[list[Path]],
+    hash_function: Callable[[Path], str],
+    jobs: int,
+) -> list[list[Path]]:
+    paths = [path for group in groups for path in group]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        digests = dict(
+            zip(paths, executor.map(lambda path: _digest(hash_function, path), paths))
+        )
+    split_groups: list[list[Path]] = []
+    for group in groups:
+        by_digest: dict[str, list[Path]] = {}
+        for path in group:
+            digest = digests[path]
+            if digest is not None:
+                by_digest.setdefault(digest, []).append(path)
+        split_groups += [paths for paths in by_digest.values() if len(paths) > 1]
+    return split_groups
+
+
+def find_duplicates(
+    paths: Iterable[Path],
+    jobs: int = 1,
+    index: TagIndex | None = None,
+) -> list[list[Path]]:
+    metrics = get_metrics()
+    by_size: dict[int, list[Path]] = {}
+    for path in paths:
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            continue
+        by_size.setdefault(size, []).append(path)
+
+    with metrics.stage("hash"):
+        groups = _split(
+            [paths for paths in by_size.values() if len(paths) > 1],
+            _cached(hash_partial, "partial", index),
+            jobs,
+        )
+        small_groups = [
+            group for group in groups if group[0].stat().st_size <= PARTIAL_HASH_SIZE
+        ]
+        groups = small_groups + _split(
+            [group for group in groups if group[0].stat().st_size > PARTIAL_HASH_SIZE],
+            _cached(hash_file, "full", index),
+            jobs,
+        )
+
+    groups = sorted(sorted(group) for group in groups)
+    metrics.add("duplicate_groups", len(groups))
+    metrics.add("duplicate_titles", sum(len(group) - 1 for group in groups))
+    return groups
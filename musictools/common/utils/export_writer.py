@@ -0,0 +1,125 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, TextIO
+
+
+class ExportWriter(ABC):
+    extension: str
+
+    def __init__(
+        self,
+        file: TextIO,
+    ):
+        self.file = file
+
+    @abstractmethod
+    def begin_group(
+        self,
+        name: str,
+    ):
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_entry(
+        self,
+        key: str,
+        entry: dict[str, Any],
+    ):
+        raise NotImplementedError
+
+    @abstractmethod
+    def end_group(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        raise NotImplementedError
+
+
+class JSONExportWriter(ExportWriter):
+    extension = ".json"
+
+    def __init__(
+        self,
+        file: TextIO,
+    ):
+        super().__init__(file)
+        self._empty = [True]
+        self.file.write("{")
+
+    def _write_key(
+        self,
+        key: str,
+    ):
+        separator = "\n" if self._empty[-1] else ",\n"
+        indent = "  " * len(self._empty)
+        self.file.write(f"{separator}{indent}{json.dumps(key)}: ")
+        self._empty[-1] = False
+
+    def begin_group(
+        self,
+        name: str,
+    ):
+        self._write_key(name)
+        self.file.write("{")
+        self._empty.append(True)
+
+    def write_entry(
+        self,
+        key: str,
+        entry: dict[str, Any],
+    ):
+        self._write_key(key)
+        self.file.write(
+            json.dumps(entry, indent=2).replace("\n", "\n" + "  " * len(self._empty))
+        )
+
+    def end_group(self):
+        empty = self._empty.pop()
+        if empty:
+            self.file.write("}")
+        else:
+            self.file.write("\n" + "  " * len(self._empty) + "}")
+
+    def close(self):
+        while self._empty:
+            self.end_group()
+
+
+class NDJSONExportWriter(ExportWriter):
+    extension = ".ndjson"
+
+    def __init__(
+        self,
+        file: TextIO,
+    ):
+        super().__init__(file)
+        self._group: str | None = None
+
+    def begin_group(
+        self,
+        name: str,
+    ):
+        self._group = name
+
+    def write_entry(
+        self,
+        key: str,
+        entry: dict[str, Any],
+    ):
+        line = {"key": key, **entry}
+        if self._group is not None:
+            line = {"playlist": self._group, **line}
+        self.file.write(json.dumps(line) + "\n")
+
+    def end_group(self):
+        self._group = None
+
+    def close(self):
+        return
+
+
+EXPORT_WRITERS: dict[str, type[ExportWriter]] = {
+    "json": JSONExportWriter,
+    "ndjson": NDJSONExportWriter,
+}
@@ -1,34 +1,80 @@
 import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 from musictools import SUPPORTED_FORMATS
+from musictools.common.value_objects.music_file import MusicFile
 from musictools.common.value_objects.playlist import Playlist
 
 
-def list_titles(path: Path) -> list[Path]:
+def _scan_directory(path: str) -> list[tuple[str, bool]]:
+    listing: list[tuple[str, bool]] = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                listing.append((entry.path, True))
+            elif os.path.splitext(entry.name)[1][1:] in SUPPORTED_FORMATS:
+                listing.append((entry.path, False))
+    return listing
+
+
+def _iter_listing(
+    listing: list[tuple[str, bool]],
+    scan: Callable[[str], Callable[[], list[tuple[str, bool]]]],
+) -> Iterator[Path]:
+    entries = [
+        (entry_path, scan(entry_path) if is_directory else None)
+        for entry_path, is_directory in listing
+    ]
+    for entry_path, pending_listing in entries:
+        if pending_listing is None:
+            yield Path(entry_path)
+        else:
+            yield from _iter_listing(pending_listing(), scan)
+
+
+def iter_titles(
+    path: Path,
+    jobs: int = 1,
+) -> Iterator[Path]:
     if not os.path.isdir(path):
         if path.suffix.replace(".", "") in SUPPORTED_FORMATS:
-            return [path]
-        else:
-            return []
-    else:
-        ret_list: list[Path] = []
-        for item in path.iterdir():
-            item_list = list_titles(path / item)
-            ret_list += item_list
+            yield path
+        return
 
-        return ret_list
+    if jobs <= 1:
+        yield from _iter_listing(
+            _scan_directory(str(path)),
+            lambda directory: partial(_scan_directory, directory),
+        )
+        return
 
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        yield from _iter_listing(
+            _scan_directory(str(path)),
+            lambda directory: executor.submit(_scan_directory, directory).result,
+        )
 
-def get_playlists(path: Path) -> list[Playlist]:
-    item_list = os.listdir(path)
-    ret_list: list[Playlist] = []
-    for item in item_list:
-        if item.endswith(".m3u"):
-            ret_list.append(
-                Playlist.from_file(
-                    title_prefix_path=Path(path),
-                    path=path / item,
-                )
+
+def list_titles(
+    path: Path,
+    jobs: int = 1,
+) -> list[Path]:
+    return list(iter_titles(path, jobs))
+
+
+def iter_playlists(path: Path) -> Iterator[Playlist]:
+    tracks: dict[Path, MusicFile] = {}
+    for item in os.listdir(path):
+        if item.endswith((".m3u", ".m3u8")):
+            yield Playlist.from_file(
+                title_prefix_path=Path(path),
+                path=path / item,
+                tracks=tracks,
             )
-    return ret_list
+
+
+def get_playlists(path: Path) -> list[Playlist]:
+    return list(iter_playlists(path))
@@ -0,0 +1,188 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+POLL_INTERVAL = 2.0
+
+
+class FileWatcher(ABC):
+    location: Path
+
+    def __init__(
+        self,
+        location: Path,
+    ):
+        self.location = location
+
+    @abstractmethod
+    def poll(
+        self,
+        timeout: float | None,
+    ) -> set[Path]:
+        raise NotImplementedError
+
+    def close(self):
+        return
+
+    def wait_for_changes(
+        self,
+        debounce: float,
+    ) -> set[Path]:
+        changes = self.poll(timeout=None)
+        while True:
+            more_changes = self.poll(timeout=debounce)
+            if not more_changes:
+                return changes
+            changes |= more_changes
+
+
+class InotifyWatcher(FileWatcher):
+    def __init__(
+        self,
+        location: Path,
+    ):
+        super().__init__(location)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: dict[int, Path] = {}
+        self._watch_tree(location)
+
+    def _watch(
+        self,
+        directory: Path,
+    ):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Could not watch {str(directory)}")
+        self._directories[wd] = directory
+
+    def _watch_tree(
+        self,
+        directory: Path,
+    ) -> set[Path]:
+        paths: set[Path] = set()
+        for root, _, files in os.walk(directory):
+            self._watch(Path(root))
+            paths.update(Path(root) / name for name in files)
+        return paths
+
+    def poll(
+        self,
+        timeout: float | None,
+    ) -> set[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changes: set[Path] = set()
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                return changes
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    changes.add(self.location)
+                    continue
+                if mask & IN_IGNORED:
+                    self._directories.pop(wd, None)
+                    continue
+                directory = self._directories.get(wd)
+                if directory is None:
+                    continue
+                path = directory / os.fsdecode(name) if name else directory
+                changes.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        changes |= self._watch_tree(path)
+                    except OSError:
+                        changes.add(self.location)
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher(FileWatcher):
+    def __init__(
+        self,
+        location: Path,
+        interval: float = POLL_INTERVAL,
+    ):
+        super().__init__(location)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        snapshot: dict[Path, tuple[int, int]] = {}
+        for root, _, files in os.walk(self.location):
+            for name in files:
+                path = Path(root) / name
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def poll(
+        self,
+        timeout: float | None,
+    ) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval
+            if deadline is not None:
+                wait = min(wait, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+            snapshot = self._scan()
+            changes = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+
+def create_watcher(location: Path) -> FileWatcher:
+    try:
+        return InotifyWatcher(location)
+    except (AttributeError, OSError, TypeError):
+        return PollingWatcher(location)
@@ -0,0 +1,169 @@
+import argparse
+import cProfile
+import json
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+HISTOGRAM_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300]
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+
+    def observe(
+        self,
+        value: float,
+    ):
+        index = 0
+        while index < len(HISTOGRAM_BUCKETS) and value > HISTOGRAM_BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def to_dict(self) -> dict[str, Any]:
+        buckets = {
+            f"le_{str(bound)}": count
+            for bound, count in zip(HISTOGRAM_BUCKETS, self.counts)
+        }
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.minimum if self.count else 0.0,
+            "max": self.maximum,
+            "mean": self.total / self.count if self.count else 0.0,
+            "buckets": buckets,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages: dict[str, dict[str, float]] = {}
+        self.counters: dict[str, int] = {}
+        self.histograms: dict[str, Histogram] = {}
+
+    def reset(self):
+        with self._lock:
+            self.started = time.perf_counter()
+            self.stages.clear()
+            self.counters.clear()
+            self.histograms.clear()
+
+    @contextmanager
+    def stage(
+        self,
+        name: str,
+    ) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+                stage["seconds"] += elapsed
+                stage["calls"] += 1
+
+    def timed(
+        self,
+        name: str,
+        iterable: Iterable,
+    ) -> Iterator:
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def add(
+        self,
+        counter: str,
+        value: int = 1,
+    ):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def observe(
+        self,
+        histogram: str,
+        value: float,
+    ):
+        with self._lock:
+            self.histograms.setdefault(histogram, Histogram()).observe(value)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "wall_seconds": time.perf_counter() - self.started,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "histograms": {
+                    name: histogram.to_dict()
+                    for name, histogram in self.histograms.items()
+                },
+            }
+
+    def write(
+        self,
+        path: Path,
+    ):
+        with open(path, "wt") as metrics_file:
+            metrics_file.write(json.dumps(self.to_dict(), indent=2))
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def add_instrumentation_arguments(
+    parser: argparse.ArgumentParser,
+    command: str,
+):
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        default=Path(f"{command}-metrics.json"),
+        help="file the run's stage timings, byte counts and latency histograms are written to",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        help="write cProfile stats of the run to this file",
+    )
+
+
+@contextmanager
+def instrumented(args: argparse.Namespace) -> Iterator[Metrics]:
+    metrics = get_metrics()
+    metrics.reset()
+    profile = cProfile.Profile() if args.profile else None
+    if profile:
+        profile.enable()
+    try:
+        yield metrics
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(args.profile)
+        if args.metrics:
+            metrics.write(args.metrics)
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+PAGE_CACHE_DIRECTORY = ".cache/pages"
+
+
+@dataclass
+class CachedPage:
+    url: str
+    text: str
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+    def is_fresh(
+        self,
+        max_age: int,
+    ) -> bool:
+        return time.time() - self.fetched_at < max_age
+
+    def validators(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    location: Path
+
+    def __init__(
+        self,
+        location: Path,
+    ):
+        self.location = location
+        self.location.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def open(
+        cls,
+        download_location: Path,
+    ) -> "PageCache":
+        return cls(download_location / PAGE_CACHE_DIRECTORY)
+
+    def _path(
+        self,
+        url: str,
+    ) -> Path:
+        return self.location / (hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get(
+        self,
+        url: str,
+    ) -> CachedPage | None:
+        path = self._path(url)
+        try:
+            with open(path, "rt", encoding="utf-8") as cache_file:
+                page = CachedPage(**json.loads(cache_file.read()))
+        except (FileNotFoundError, ValueError, TypeError):
+            return None
+        return page if page.url == url else None
+
+    def put(
+        self,
+        page: CachedPage,
+    ):
+        path = self._path(page.url)
+        temporary_path = path.with_name(
+            f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(temporary_path, "wt", encoding="utf-8") as cache_file:
+            cache_file.write(json.dumps(asdict(page)))
+        os.replace(temporary_path, path)
@@ -0,0 +1,27 @@
+from pathlib import Path
+
+
+class PathMapper:
+    __slots__ = ("source", "target", "suffix")
+
+    def __init__(
+        self,
+        source: Path,
+        target: Path,
+        suffix: str | None = None,
+    ):
+        self.source = source.as_posix().rstrip("/")
+        self.target = target.as_posix().rstrip("/")
+        self.suffix = suffix
+
+    def map(
+        self,
+        path: Path,
+    ) -> Path:
+        posix = path.as_posix()
+        if posix != self.source and not posix.startswith(self.source + "/"):
+            return path
+        mapped = Path(self.target + posix[len(self.source) :])
+        if self.suffix:
+            mapped = mapped.with_suffix(self.suffix)
+        return mapped
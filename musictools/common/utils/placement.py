@@ -0,0 +1,100 @@
+import os
+import shutil
+from pathlib import Path
+
+FICLONE = 0x40049409
+
+
+def _temporary_path(target: Path) -> Path:
+    return target.with_name(target.name + ".tmp")
+
+
+def _copy(
+    source: Path,
+    target: Path,
+):
+    temporary_path = _temporary_path(target)
+    try:
+        shutil.copy(str(source), str(temporary_path))
+        os.replace(temporary_path, target)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+
+
+def _hardlink(
+    source: Path,
+    target: Path,
+):
+    temporary_path = _temporary_path(target)
+    temporary_path.unlink(missing_ok=True)
+    os.link(source, temporary_path)
+    os.replace(temporary_path, target)
+
+
+def _reflink(
+    source: Path,
+    target: Path,
+):
+    import fcntl
+
+    temporary_path = _temporary_path(target)
+    try:
+        with (
+            open(source, "rb") as source_file,
+            open(temporary_path, "wb") as target_file,
+        ):
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+        shutil.copymode(source, temporary_path)
+        os.replace(temporary_path, target)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+
+
+def _copy_file_range(
+    source: Path,
+    target: Path,
+):
+    temporary_path = _temporary_path(target)
+    try:
+        with (
+            open(source, "rb") as source_file,
+            open(temporary_path, "wb") as target_file,
+        ):
+            remaining = os.fstat(source_file.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(
+                    source_file.fileno(), target_file.fileno(), remaining
+                )
+                if copied == 0:
+                    raise OSError(f"copy_file_range stopped early on {str(source)}")
+                remaining -= copied
+        shutil.copymode(source, temporary_path)
+        os.replace(temporary_path, target)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+
+
+PLACERS = {
+    "hardlink": _hardlink,
+    "reflink": _reflink,
+    "copy_file_range": _copy_file_range,
+}
+
+
+def place_file(
+    source: Path,
+    target: Path,
+    strategy: str,
+) -> str:
+    placer = PLACERS.get(strategy)
+    if placer:
+        try:
+            placer(source, target)
+            return strategy
+        except (AttributeError, ImportError, OSError):
+            pass
+    _copy(source, target)
+    return "copy"
@@ -0,0 +1,184 @@
+import random
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 503}
+MAX_BACKOFF = 60.0
+CONNECT_TIMEOUT = 10.0
+
+
+@dataclass
+class SchedulerStats:
+    requests: int = 0
+    retries: int = 0
+    throttle_events: int = 0
+    failures: int = 0
+
+
+def _retry_after(response: "requests.Response") -> float | None:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    def __init__(
+        self,
+        session: "requests.Session",
+        requests_per_second: int,
+        max_concurrency: int,
+        max_retries: int,
+        read_timeout: float = 30.0,
+        backoff: float = 1.0,
+    ):
+        self.session = session
+        self.timeout = (CONNECT_TIMEOUT, read_timeout)
+        self.rate = requests_per_second
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = SchedulerStats()
+        self._tokens = float(requests_per_second)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._bucket_lock = threading.Lock()
+        self._slots = threading.Condition()
+        self._active = 0
+        self._successes = 0
+
+    def _take_token(self):
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    float(self.rate),
+                    self._tokens + (now - self._last_refill) * self.rate,
+                )
+                self._last_refill = now
+                wait = self._paused_until - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats.requests += 1
+                    return
+                wait = max(wait, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._slots:
+            while self._active >= self.concurrency:
+                self._slots.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._slots:
+                self._active -= 1
+                self._slots.notify()
+
+    def _on_success(self):
+        with self._slots:
+            self._successes += 1
+            if (
+                self._successes >= self.concurrency
+                and self.concurrency < self.max_concurrency
+            ):
+                self.concurrency += 1
+                self._successes = 0
+                self._slots.notify()
+
+    def _on_throttle(
+        self,
+        retry_after: float | None,
+    ):
+        with self._slots:
+            self.stats.throttle_events += 1
+            self.concurrency = max(1, self.concurrency // 2)
+            self._successes = 0
+        if retry_after is not None:
+            with self._bucket_lock:
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after
+                )
+
+    def _count_failure(self):
+        with self._slots:
+            self.stats.failures += 1
+
+    def _backoff_delay(
+        self,
+        attempt: int,
+    ) -> float:
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2**attempt))
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        **kwargs,
+    ) -> "requests.Response":
+        import requests
+
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        while True:
+            self._take_token()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    self._count_failure()
+                    raise
+                delay = self._backoff_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    self._on_success()
+                    return response
+                if attempt >= self.max_retries:
+                    self._count_failure()
+                    return response
+                retry_after = _retry_after(response)
+                if response.status_code in THROTTLE_STATUS_CODES:
+                    self._on_throttle(retry_after)
+                delay = (
+                    retry_after
+                    if retry_after is not None
+                    else self._backoff_delay(attempt)
+                )
+                response.close()
+            attempt += 1
+            with self._slots:
+                self.stats.retries += 1
+            time.sleep(min(delay, MAX_BACKOFF))
+
+    def get(
+        self,
+        url: str,
+        **kwargs,
+    ) -> "requests.Response":
+        return self.request("GET", url, **kwargs)
+
+    def report(self) -> str:
+        return (
+            f"{str(self.stats.requests)} request(s), "
+            f"{str(self.stats.retries)} retr(ies), "
+            f"{str(self.stats.throttle_events)} throttle event(s), "
+            f"{str(self.stats.failures)} failure(s), "
+            f"final concurrency {str(self.concurrency)}/{str(self.max_concurrency)}"
+        )
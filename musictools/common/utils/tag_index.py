@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from musictools.common.value_objects.track_tags import TrackTags
+
+INDEX_FILENAME = ".musictools-index.sqlite"
+COMMIT_INTERVAL = 500
+
+
+class TagIndex:
+    path: Path
+    read_only: bool
+
+    def __init__(
+        self,
+        path: Path,
+        read_only: bool = False,
+    ):
+        self.path = path
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        self._pending = 0
+        if read_only:
+            self._connection = sqlite3.connect(
+                f"{path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+            )
+            return
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tags (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                artist TEXT NOT NULL,
+                album TEXT NOT NULL,
+                title TEXT NOT NULL,
+                track TEXT NOT NULL,
+                genre TEXT NOT NULL,
+                bitrate REAL NOT NULL,
+                duration REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS digests (
+                path TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (path, kind)
+            )
+            """
+        )
+        self._connection.commit()
+
+    @classmethod
+    def open(
+        cls,
+        library_location: Path,
+        read_only: bool = False,
+    ) -> "TagIndex | None":
+        path = library_location / INDEX_FILENAME
+        if read_only and not path.exists():
+            return None
+        if not read_only and not os.access(library_location, os.W_OK):
+            return None
+        try:
+            return cls(path, read_only)
+        except sqlite3.Error:
+            return None
+
+    def get(
+        self,
+        path: Path,
+        stat: os.stat_result,
+    ) -> TrackTags | None:
+        with self._lock:
+            row = self._connection.execute(
+                """
+                SELECT artist, album, title, track, genre, bitrate, duration
+                FROM tags WHERE path = ? AND size = ? AND mtime_ns = ?
+                """,
+                (path.as_posix(), stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if not row:
+            return None
+        artist, album, title, track, genre, bitrate, duration = row
+        return TrackTags(
+            artist=json.loads(artist),
+            album=album,
+            title=title,
+            track=track,
+            genre=json.loads(genre),
+            bitrate=bitrate,
+            duration=duration,
+        )
+
+    def put(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        tags: TrackTags,
+    ):
+        if self.read_only:
+            return
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    path.as_posix(),
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    json.dumps([str(artist) for artist in tags.artist]),
+                    str(tags.album),
+                    str(tags.title),
+                    str(tags.track),
+                    json.dumps([str(genre) for genre in tags.genre]),
+                    tags.bitrate,
+                    tags.duration,
+                ),
+            )
+            self._count_pending()
+
+    def get_digest(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        kind: str,
+    ) -> str | None:
+        with self._lock:
+            try:
+                row = self._connection.execute(
+                    """
+                    SELECT digest FROM digests
+                    WHERE path = ? AND kind = ? AND size = ? AND mtime_ns = ?
+                    """,
+                    (path.as_posix(), kind, stat.st_size, stat.st_mtime_ns),
+                ).fetchone()
+            except sqlite3.OperationalError:
+                return None
+        return row[0] if row else None
+
+    def put_digest(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        kind: str,
+        digest: str,
+    ):
+        if self.read_only:
+            return
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?)",
+                (path.as_posix(), kind, stat.st_size, stat.st_mtime_ns, digest),
+            )
+            self._count_pending()
+
+    def _count_pending(self):
+        self._pending += 1
+        if self._pending >= COMMIT_INTERVAL:
+            self._connection.commit()
+            self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
@@ -0,0 +1,41 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import time
+from pathlib import Path
+from musictools.common.utils.metrics import get_metrics
+from musictools.common.value_objects.music_file import MusicFile
+from musictools.common.value_objects.track_tags import TrackTags
+
+
+def read_tags(path: Path) -> TrackTags:
+    metrics = get_metrics()
+    start = time.perf_counter()
+    with metrics.stage("tag_read"):
+        music_file = MusicFile.from_file(path)
+        music_file.load()
+    metrics.observe("title_seconds", time.perf_counter() - start)
+    return music_file.tags
+
+
+class TagReader:
+    def __init__(
+        self,
+        jobs: int,
+        shared_paths: set[Path] | None = None,
+    ):
+        self._executor = ThreadPoolExecutor(max_workers=jobs)
+        self._shared_paths = shared_paths or set()
+        self._futures: dict[Path, Future[TrackTags]] = {}
+
+    def submit(
+        self,
+        path: Path,
+    ) -> Future[TrackTags]:
+        future = self._futures.get(path)
+        if not future:
+            future = self._executor.submit(read_tags, path)
+            if path in self._shared_paths:
+                self._futures[path] = future
+        return future
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
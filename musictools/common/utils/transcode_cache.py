@@ -0,0 +1,189 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from musictools.common.utils.placement import place_file
+
+CACHE_INDEX_FILENAME = "index.sqlite"
+HASH_CHUNK_SIZE = 1024 * 1024
+COMMIT_INTERVAL = 100
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranscodeCache:
+    location: Path
+    max_size: int
+    placement: str
+
+    def __init__(
+        self,
+        location: Path,
+        max_size: int,
+        placement: str = "copy",
+    ):
+        self.location = location
+        self.max_size = max_size
+        self.placement = placement
+        self.location.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._connection = sqlite3.connect(
+            location / CACHE_INDEX_FILENAME, check_same_thread=False
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                digest TEXT NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+        self._size = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    @classmethod
+    def open(
+        cls,
+        location: Path,
+        max_size_mb: int,
+        placement: str = "copy",
+    ) -> "TranscodeCache":
+        return cls(location, max_size_mb * 1_000_000, placement)
+
+    def _commit_pending(self):
+        self._pending += 1
+        if self._pending >= COMMIT_INTERVAL:
+            self._connection.commit()
+            self._pending = 0
+
+    def _source_digest(
+        self,
+        source: Path,
+    ) -> str:
+        stat = source.stat()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT digest FROM sources WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (source.as_posix(), stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        if row:
+            return row[0]
+        digest = hash_file(source)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                (source.as_posix(), stat.st_size, stat.st_mtime_ns, digest),
+            )
+            self._commit_pending()
+        return digest
+
+    def key(
+        self,
+        source: Path,
+        quality: int,
+        variable_bitrate: bool,
+    ) -> str:
+        return hashlib.sha256(
+            f"{self._source_digest(source)};quality={quality};vbr={variable_bitrate}".encode()
+        ).hexdigest()
+
+    def _path(
+        self,
+        key: str,
+    ) -> Path:
+        return self.location / key[:2] / (key + ".mp3")
+
+    def _forget(
+        self,
+        key: str,
+        size: int,
+    ):
+        self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._size -= size
+        self._commit_pending()
+
+    def fetch(
+        self,
+        key: str,
+        target: Path,
+    ) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return False
+        try:
+            place_file(self._path(key), target, self.placement)
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key, row[0])
+            return False
+        with self._lock:
+            self._connection.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._commit_pending()
+        return True
+
+    def store(
+        self,
+        key: str,
+        output: Path,
+    ):
+        path = self._path(key)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row and path.exists():
+            return
+        path.parent.mkdir(exist_ok=True)
+        place_file(output, path, self.placement)
+        size = path.stat().st_size
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                (key, size, time.time()),
+            )
+            self._size += size - (row[0] if row else 0)
+            self._commit_pending()
+            self._evict()
+
+    def _evict(self):
+        if self._size <= self.max_size:
+            return
+        rows = self._connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_used"
+        ).fetchall()
+        for key, size in rows:
+            if self._size <= self.max_size:
+                break
+            self._path(key).unlink(missing_ok=True)
+            self._forget(key, size)
+
+    def close(self):
+        with self._lock:
+            self._connection.commit()
+            self._connection.close()
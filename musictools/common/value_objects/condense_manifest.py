@@ -0,0 +1,65 @@
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+MANIFEST_FILENAME = ".musictools-manifest.json"
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+    output: str
+    settings: str
+
+    def matches(
+        self,
+        stat: os.stat_result,
+        settings: str,
+    ) -> bool:
+        return (
+            self.size == stat.st_size
+            and self.mtime_ns == stat.st_mtime_ns
+            and self.settings == settings
+        )
+
+
+@dataclass
+class CondenseManifest:
+    path: Path
+    entries: dict[str, ManifestEntry]
+
+    @classmethod
+    def from_file(
+        cls,
+        condensed_location: Path,
+    ) -> "CondenseManifest":
+        path = condensed_location / MANIFEST_FILENAME
+        manifest = cls(path=path, entries={})
+        if not path.exists():
+            return manifest
+        with open(path, "rt") as manifest_file:
+            entries_dict = json.loads(manifest_file.read())
+        for key, entry_dict in entries_dict.items():
+            manifest.entries[key] = ManifestEntry(**entry_dict)
+        return manifest
+
+    def save(self):
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "wt") as manifest_file:
+            manifest_file.write(
+                json.dumps(
+                    obj={key: asdict(entry) for key, entry in self.entries.items()},
+                    indent=2,
+                )
+            )
+        os.replace(temporary_path, self.path)
+
+    def retain(
+        self,
+        keys: set[str],
+    ):
+        for key in list(self.entries):
+            if key not in keys:
+                del self.entries[key]
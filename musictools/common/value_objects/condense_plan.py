@@ -0,0 +1,36 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from musictools.common.value_objects.condense_manifest import ManifestEntry
+
+
+@dataclass
+class PlannedTitle:
+    key: str
+    source: Path
+    target: Path
+    action: str
+    estimated_size: int = 0
+    manifest_entry: ManifestEntry | None = None
+    error: str | None = None
+    original: Path | None = None
+
+
+@dataclass
+class CondensePlan:
+    titles: list[PlannedTitle] = field(default_factory=list)
+    removals: list[Path] = field(default_factory=list)
+    removal_size: int = 0
+    duplicates: int = 0
+    outside_library: list[Path] = field(default_factory=list)
+
+    def by_action(
+        self,
+        action: str,
+    ) -> list[PlannedTitle]:
+        return [title for title in self.titles if title.action == action]
+
+    def estimated_size(
+        self,
+        action: str,
+    ) -> int:
+        return sum(title.estimated_size for title in self.by_action(action))
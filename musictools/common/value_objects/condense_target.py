@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from musictools.common.value_objects.condense_manifest import CondenseManifest
+from musictools.common.value_objects.condense_plan import CondensePlan
+from musictools.config import CondenseConfig, LibraryConfig
+
+
+@dataclass
+class CondenseTarget:
+    library_config: LibraryConfig
+    condense_config: CondenseConfig
+    manifest: CondenseManifest
+    plan: CondensePlan = field(default_factory=CondensePlan)
+
+    @property
+    def location(self) -> str:
+        return self.library_config.condensed_location
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+QUEUE_FILENAME = ".download-queue.json"
+
+
+@dataclass
+class QueuedAlbum:
+    url: str
+    status: str = "pending"
+    completed: list[int] = field(default_factory=list)
+
+
+@dataclass
+class DownloadQueue:
+    path: Path
+    albums: dict[str, QueuedAlbum]
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(
+        cls,
+        download_location: Path,
+    ) -> "DownloadQueue":
+        path = download_location / QUEUE_FILENAME
+        queue = cls(path=path, albums={})
+        if not path.exists():
+            return queue
+        with open(path, "rt") as queue_file:
+            albums_list = json.loads(queue_file.read())
+        for album_dict in albums_list:
+            album = QueuedAlbum(**album_dict)
+            queue.albums[album.url] = album
+        return queue
+
+    def save(self):
+        with self._lock:
+            albums_list = [asdict(album) for album in self.albums.values()]
+            temporary_path = self.path.with_name(self.path.name + ".tmp")
+            with open(temporary_path, "wt") as queue_file:
+                queue_file.write(json.dumps(albums_list, indent=2))
+            os.replace(temporary_path, self.path)
+
+    def add(
+        self,
+        urls: list[str],
+    ):
+        for url in urls:
+            album = self.albums.get(url)
+            if album is None:
+                self.albums[url] = QueuedAlbum(url=url)
+            elif album.status == "done":
+                album.status = "pending"
+                album.completed = []
+
+    def pending(self) -> list[QueuedAlbum]:
+        return [album for album in self.albums.values() if album.status != "done"]
+
+    def mark_completed(
+        self,
+        album: QueuedAlbum,
+        title: int,
+    ):
+        with self._lock:
+            album.completed.append(title)
+
+    def mark_status(
+        self,
+        album: QueuedAlbum,
+        status: str,
+    ):
+        with self._lock:
+            album.status = status
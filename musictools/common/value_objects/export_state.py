@@ -0,0 +1,64 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+EXPORT_STATE_FILENAME = ".musictools-export-state.json"
+
+
+@dataclass
+class ExportStateEntry:
+    path: str
+    size: int
+    mtime_ns: int
+    tags: dict[str, Any]
+
+    def matches(
+        self,
+        stat: os.stat_result,
+    ) -> bool:
+        return self.size == stat.st_size and self.mtime_ns == stat.st_mtime_ns
+
+
+@dataclass
+class ExportState:
+    path: Path
+    sequence: int = 0
+    titles: dict[str, ExportStateEntry] = field(default_factory=dict)
+    playlists: dict[str, list[str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_file(
+        cls,
+        export_location: Path,
+    ) -> "ExportState":
+        path = export_location / EXPORT_STATE_FILENAME
+        state = cls(path=path)
+        if not path.exists():
+            return state
+        with open(path, "rt") as state_file:
+            state_dict = json.loads(state_file.read())
+        state.sequence = state_dict["sequence"]
+        state.titles = {
+            key: ExportStateEntry(**entry_dict)
+            for key, entry_dict in state_dict["titles"].items()
+        }
+        state.playlists = state_dict["playlists"]
+        return state
+
+    def save(self):
+        temporary_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary_path, "wt") as state_file:
+            state_file.write(
+                json.dumps(
+                    obj={
+                        "sequence": self.sequence,
+                        "titles": {
+                            key: asdict(entry) for key, entry in self.titles.items()
+                        },
+                        "playlists": self.playlists,
+                    },
+                )
+            )
+        os.replace(temporary_path, self.path)
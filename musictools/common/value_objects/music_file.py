@@ -1,14 +1,25 @@
 from abc import ABC, abstractmethod
-from mutagen.flac import FLAC
-from mutagen.id3 import ID3
-from mutagen.mp3 import MP3
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, ClassVar
+from musictools.common.utils.audio_probe import ProbeError, probe_flac, probe_mp3
+from musictools.common.utils.tag_index import TagIndex
+from musictools.common.value_objects.stream_info import StreamInfo
+from musictools.common.value_objects.track_tags import TrackTags
 
+if TYPE_CHECKING:
+    from mutagen.id3 import ID3
 
-@dataclass
+
+@dataclass(slots=True)
 class MusicFile(ABC):
+    index: ClassVar[TagIndex | None] = None
+
     path: Path
+    tags: TrackTags | None
+    stream: StreamInfo | None
 
     @staticmethod
     def from_file(file_path: Path) -> "MusicFile":
@@ -18,130 +29,153 @@ class MusicFile(ABC):
             return FLACFile.from_file(file_path)
         else:
             raise ValueError("This file type is currently not suported.")
-        
-    @abstractmethod
-    def load(self):
-        raise NotImplementedError
-
-    @property
-    @abstractmethod
-    def artist(self) -> list[str]:
-        return []
 
-    @property
-    @abstractmethod
-    def album(self) -> str:
-        return ""
-
-    @property
-    @abstractmethod
-    def title(self) -> str:
-        return ""
+    @staticmethod
+    def use_index(index: TagIndex | None):
+        MusicFile.index = index
 
-    @property
-    @abstractmethod
-    def track(self) -> str:
-        return ""
+    @staticmethod
+    @contextmanager
+    def indexed(
+        library_location: Path,
+        read_only: bool = False,
+    ) -> Iterator[None]:
+        MusicFile.use_index(TagIndex.open(library_location, read_only))
+        try:
+            yield
+        finally:
+            if MusicFile.index:
+                MusicFile.index.close()
+            MusicFile.use_index(None)
 
-    @property
-    @abstractmethod
-    def genre(self) -> str:
-        return []
+    def load(self):
+        if not MusicFile.index:
+            self.tags = self._read_tags()
+            return
+        stat = self.path.stat()
+        self.tags = MusicFile.index.get(self.path, stat)
+        if not self.tags:
+            self.tags = self._read_tags()
+            MusicFile.index.put(self.path, stat, self.tags)
+
+    def probe(self):
+        if MusicFile.index:
+            self.tags = MusicFile.index.get(self.path, self.path.stat())
+            if self.tags:
+                self.stream = StreamInfo(
+                    bitrate=self.tags.bitrate,
+                    duration=self.tags.duration,
+                )
+                return
+        try:
+            self.stream = self._probe_stream()
+        except ProbeError:
+            self.load()
+            self.stream = StreamInfo(
+                bitrate=self.tags.bitrate,
+                duration=self.tags.duration,
+            )
 
-    @property
     @abstractmethod
-    def bitrate(self) -> float:
-        pass
+    def _read_tags(self) -> TrackTags:
+        raise NotImplementedError
 
-    @property
     @abstractmethod
-    def quality(self) -> float:
-        pass
-
-
-@dataclass
-class MP3File(MusicFile):
-    mp3: MP3 | None
-    id3: ID3 | None
-
-    @staticmethod
-    def from_file(file_path: Path) -> "MP3File":
-        return MP3File(path=file_path, mp3=None, id3=None)
-    
-    def load(self):
-        self.mp3 = MP3(self.path)
-        self.id3 = self.mp3.tags or ID3()
-
-    def _texts(self, frame_id: str) -> list[str]:
-        texts: list[str] = []
-        for frame in self.id3.getall(frame_id):
-            texts.extend(frame.text)
-        return texts
+    def _probe_stream(self) -> StreamInfo:
+        raise NotImplementedError
 
     @property
     def artist(self) -> list[str]:
-        return self._texts("TPE1")
+        return self.tags.artist
 
     @property
     def album(self) -> str:
-        return (self._texts("TALB") or [""])[0]
+        return self.tags.album
 
     @property
     def title(self) -> str:
-        return (self._texts("TIT2") or [""])[0]
+        return self.tags.title
 
     @property
     def track(self) -> str:
-        return (self._texts("TRCK") or [""])[0]
+        return self.tags.track
 
     @property
     def genre(self) -> list[str]:
-        return self._texts("TCON")
+        return self.tags.genre
 
     @property
     def bitrate(self) -> float:
-        return self.mp3.info.bitrate / 1000
+        if self.stream:
+            return self.stream.bitrate
+        return self.tags.bitrate
+
+    @property
+    def duration(self) -> float:
+        if self.stream:
+            return self.stream.duration
+        return self.tags.duration
 
     @property
     def quality(self) -> float:
         return self.bitrate / 32
 
 
-@dataclass
+@dataclass(slots=True)
+class MP3File(MusicFile):
+    @staticmethod
+    def from_file(file_path: Path) -> "MP3File":
+        return MP3File(path=file_path, tags=None, stream=None)
+
+    def _read_tags(self) -> TrackTags:
+        from mutagen.id3 import ID3
+        from mutagen.mp3 import MP3
+
+        mp3 = MP3(self.path)
+        id3 = mp3.tags or ID3()
+        return TrackTags(
+            artist=_texts(id3, "TPE1"),
+            album=(_texts(id3, "TALB") or [""])[0],
+            title=(_texts(id3, "TIT2") or [""])[0],
+            track=(_texts(id3, "TRCK") or [""])[0],
+            genre=_texts(id3, "TCON"),
+            bitrate=mp3.info.bitrate / 1000,
+            duration=mp3.info.length,
+        )
+
+    def _probe_stream(self) -> StreamInfo:
+        return probe_mp3(self.path)
+
+
+def _texts(
+    id3: "ID3",
+    frame_id: str,
+) -> list[str]:
+    texts: list[str] = []
+    for frame in id3.getall(frame_id):
+        texts.extend(frame.text)
+    return texts
+
+
+@dataclass(slots=True)
 class FLACFile(MusicFile):
-    flac: FLAC | None
-
     @staticmethod
     def from_file(file_path: Path) -> "FLACFile":
-        return FLACFile(path=file_path, flac=None)
-    
-    def load(self):
-        self.flac = FLAC(self.path)
-
-    @property
-    def artist(self) -> list[str]:
-        return self.flac.get("artist", [])
-
-    @property
-    def album(self) -> str:
-            return self.flac.get("album", [""])[0]
-
-    @property
-    def title(self) -> str:
-        return self.flac.get("title", [""])[0]
-
-    @property
-    def track(self) -> str:
-        return self.flac.get("track", [""])[0]
-
-    @property
-    def genre(self) -> list[str]:
-        return self.flac.get("genre", [])
-
-    @property
-    def bitrate(self) -> float:
-        return 9999
-
-    @property
-    def quality(self) -> float:
-        return self.bitrate / 32
+        return FLACFile(path=file_path, tags=None, stream=None)
+
+    def _read_tags(self) -> TrackTags:
+        from mutagen.flac import FLAC
+
+        flac = FLAC(self.path)
+        return TrackTags(
+            artist=flac.get("artist", []),
+            album=flac.get("album", [""])[0],
+            title=flac.get("title", [""])[0],
+            track=flac.get("track", [""])[0],
+            genre=flac.get("genre", []),
+            bitrate=flac.info.bitrate / 1000,
+            duration=flac.info.length,
+        )
+
+    def _probe_stream(self) -> StreamInfo:
+        return probe_flac(self.path)
@@ -1,8 +1,20 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from musictools import SUPPORTED_FORMATS
+from musictools.common.utils.path_mapper import PathMapper
 from musictools.common.value_objects.music_file import MusicFile
 
+TITLE_SUFFIXES = tuple(SUPPORTED_FORMATS)
+
+
+def _encoding(
+    path: Path,
+    reading: bool = True,
+) -> str | None:
+    if path.suffix != ".m3u8":
+        return None
+    return "utf-8-sig" if reading else "utf-8"
+
 
 @dataclass
 class Playlist:
@@ -10,12 +22,15 @@ class Playlist:
     title_prefix_path: Path
     name: str
     content: list[MusicFile]
+    info: list[str | None] = field(default_factory=list)
+    path_mapper: PathMapper | None = None
 
     @classmethod
     def from_file(
         cls,
         path: Path,
         title_prefix_path: Path,
+        tracks: dict[Path, MusicFile] | None = None,
     ) -> "Playlist":
         playlist = cls(
             path=path,
@@ -23,17 +38,27 @@ class Playlist:
             name=path.name.replace(path.suffix, ""),
             content=[],
         )
-        with open(path, "rt") as playlist_file:
-            lines = playlist_file.readlines()
-        for line in lines:
-            line = line.rstrip()
-            line = line.replace("\\", "/")
-            for format in SUPPORTED_FORMATS:
-                if line.endswith(format):
-                    playlist.content.append(
-                        MusicFile.from_file(title_prefix_path / Path(line))
-                    )
+        if tracks is None:
+            tracks = {}
+        info = None
+        with open(path, "rt", encoding=_encoding(path)) as playlist_file:
+            for line in playlist_file:
+                line = line.strip()
+                if line.startswith("#"):
+                    if line.startswith("#EXTINF:"):
+                        info = line
+                    continue
+                line = line.replace("\\", "/")
+                if not line.endswith(TITLE_SUFFIXES):
                     continue
+                title_path = title_prefix_path / line
+                title = tracks.get(title_path)
+                if title is None:
+                    title = MusicFile.from_file(title_path)
+                    tracks[title_path] = title
+                playlist.content.append(title)
+                playlist.info.append(info)
+                info = None
         return playlist
 
     def save(
@@ -42,17 +67,20 @@ class Playlist:
     ):
         if not path:
             path = self.path
-        with open(path, "wt") as playlist_file:
-            for title in self.content:
-                playlist_file.write(
-                    str(title.path.relative_to(self.title_prefix_path)) + "\n"
-                )
+        with open(path, "wt", encoding=_encoding(path, reading=False)) as playlist_file:
+            if any(self.info):
+                playlist_file.write("#EXTM3U\n")
+            for title_path, info in zip(self.content_paths(), self.info):
+                if info:
+                    playlist_file.write(info + "\n")
+                if title_path.is_relative_to(self.title_prefix_path):
+                    title_path = title_path.relative_to(self.title_prefix_path)
+                playlist_file.write(str(title_path) + "\n")
 
     def content_paths(self) -> list[Path]:
-        absolute_content: list[Path] = []
-        for title in self.content:
-            absolute_content.append(title.path)
-        return absolute_content
+        if not self.path_mapper:
+            return [title.path for title in self.content]
+        return [self.path_mapper.map(title.path) for title in self.content]
 
     def condense(
         self,
@@ -61,14 +89,4 @@ class Playlist:
         format: str | None = None,
     ):
         self.title_prefix_path = condensed_location
-        for title in self.content:
-            title.path = Path(
-                title.path.as_posix().replace(
-                    location.as_posix(),
-                    condensed_location.as_posix(),
-                )
-            )
-            if format:
-                title.path = Path(
-                    title.path.as_posix().replace(title.path.suffix, format)
-                )
+        self.path_mapper = PathMapper(location, condensed_location, format)
@@ -0,0 +1,7 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class StreamInfo:
+    bitrate: float
+    duration: float
@@ -0,0 +1,18 @@
+import sys
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class TrackTags:
+    artist: list[str]
+    album: str
+    title: str
+    track: str
+    genre: list[str]
+    bitrate: float
+    duration: float
+
+    def __post_init__(self):
+        self.artist = [sys.intern(str(artist)) for artist in self.artist]
+        self.album = sys.intern(str(self.album))
+        self.genre = [sys.intern(str(genre)) for genre in self.genre]
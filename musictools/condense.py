@@ -1,29 +1,277 @@
-import ffmpeg
+import argparse
+import copy
 import os
-import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from logging import Logger
-from musictools import get_logger
-from musictools.common.utils.file_utils import get_playlists, list_titles
-from musictools.config import get_config
+from musictools import LOSSLESS_FORMATS, get_logger
+from musictools.common.utils.duplicates import find_duplicates
+from musictools.common.utils.file_utils import get_playlists, iter_titles
+from musictools.common.utils.metrics import (
+    add_instrumentation_arguments,
+    get_metrics,
+    instrumented,
+)
+from musictools.common.utils.path_mapper import PathMapper
+from musictools.common.utils.placement import place_file
+from musictools.common.utils.transcode_cache import TranscodeCache
+from musictools.config import CondenseConfig, LibraryConfig, get_config
+from musictools.common.value_objects.condense_manifest import (
+    CondenseManifest,
+    ManifestEntry,
+)
+from musictools.common.value_objects.condense_plan import CondensePlan, PlannedTitle
+from musictools.common.value_objects.condense_target import CondenseTarget
 from musictools.common.value_objects.music_file import MusicFile
 from musictools.common.value_objects.playlist import Playlist
 from pathlib import Path
 
 
-def remove_titles(playlists: list[Playlist]) -> int:
-    library_config = get_config().library
-    count_removed = 0
+def condensed_path_of(
+    title: Path,
+    library_config: LibraryConfig,
+) -> Path:
+    return PathMapper(
+        Path(library_config.location),
+        Path(library_config.condensed_location),
+    ).map(title)
+
+
+def plan_title(
+    key: str,
+    title: Path,
+    library_config: LibraryConfig,
+    condense_config: CondenseConfig,
+    manifest_entry: ManifestEntry | None,
+) -> PlannedTitle:
+    condensed_location = Path(library_config.condensed_location)
+    condensed_path = condensed_path_of(title, library_config)
+    condensed_converted_path = condensed_path.with_suffix(".mp3")
+    try:
+        stat = title.stat()
+    except FileNotFoundError:
+        return PlannedTitle(
+            key=key,
+            source=title,
+            target=condensed_path,
+            action="missing",
+        )
+    if manifest_entry:
+        if manifest_entry.matches(stat, condense_config.fingerprint):
+            return PlannedTitle(
+                key=key,
+                source=title,
+                target=condensed_location / manifest_entry.output,
+                action="existing",
+                manifest_entry=manifest_entry,
+            )
+    else:
+        for existing_path in (condensed_path, condensed_converted_path):
+            if existing_path.exists():
+                return PlannedTitle(
+                    key=key,
+                    source=title,
+                    target=existing_path,
+                    action="existing",
+                    manifest_entry=ManifestEntry(
+                        size=stat.st_size,
+                        mtime_ns=stat.st_mtime_ns,
+                        output=existing_path.relative_to(condensed_location).as_posix(),
+                        settings=condense_config.fingerprint,
+                    ),
+                )
+
+    action = "add"
+    target = condensed_path
+    estimated_size = stat.st_size
+    if condense_config.compress:
+        music_file = MusicFile.from_file(title)
+        try:
+            with get_metrics().stage("tag_read"):
+                music_file.probe()
+        except Exception as e:
+            return PlannedTitle(
+                key=key,
+                source=title,
+                target=condensed_path,
+                action="error",
+                error=str(e),
+            )
+        if (
+            title.suffix[1:] in LOSSLESS_FORMATS
+            or music_file.quality > condense_config.compression_quality
+        ):
+            action = "transcode"
+            target = condensed_converted_path
+            estimated_size = int(
+                music_file.duration * condense_config.compression_quality * 32 * 125
+            )
+    return PlannedTitle(
+        key=key,
+        source=title,
+        target=target,
+        action=action,
+        estimated_size=estimated_size,
+        manifest_entry=ManifestEntry(
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            output=target.relative_to(condensed_location).as_posix(),
+            settings=condense_config.fingerprint,
+        ),
+    )
 
-    current_titles = list_titles(Path(library_config.condensed_location))
-    all_titles: list[Path] = []
+
+def plan_condense(
+    playlists: list[Playlist],
+    manifest: CondenseManifest,
+    library_config: LibraryConfig | None = None,
+    condense_config: CondenseConfig | None = None,
+    duplicate_groups: list[list[Path]] | None = None,
+) -> CondensePlan:
+    library_config = library_config or get_config().library
+    condense_config = condense_config or get_config().condense
+    plan = CondensePlan()
+
+    unique_titles: dict[str, Path] = {}
     for playlist in playlists:
-        all_titles += playlist.content_paths()
+        for title in playlist.content_paths():
+            if not title.is_relative_to(library_config.location):
+                if title not in plan.outside_library:
+                    plan.outside_library.append(title)
+                continue
+            key = title.relative_to(library_config.location).as_posix()
+            if key in unique_titles:
+                plan.duplicates += 1
+            else:
+                unique_titles[key] = title
+
+    with ThreadPoolExecutor(max_workers=condense_config.jobs) as executor:
+        plan.titles = list(
+            executor.map(
+                lambda item: plan_title(
+                    key=item[0],
+                    title=item[1],
+                    library_config=library_config,
+                    condense_config=condense_config,
+                    manifest_entry=manifest.entries.get(item[0]),
+                ),
+                unique_titles.items(),
+            )
+        )
+
+    condensed_titles: set[Path] = set()
+    condensed_location = Path(library_config.condensed_location)
+    if condensed_location.exists():
+        with get_metrics().stage("scan"):
+            condensed_titles = set(
+                iter_titles(condensed_location, condense_config.jobs)
+            )
+    for i, planned_title in enumerate(plan.titles):
+        if (
+            planned_title.action == "existing"
+            and planned_title.target not in condensed_titles
+        ):
+            plan.titles[i] = plan_title(
+                key=planned_title.key,
+                title=planned_title.source,
+                library_config=library_config,
+                condense_config=condense_config,
+                manifest_entry=None,
+            )
+    if duplicate_groups:
+        link_duplicates(plan, duplicate_groups)
+
+    expected_titles: set[Path] = set()
+    for planned_title in plan.titles:
+        expected_titles.add(planned_title.target)
+        if planned_title.action in ("missing", "error"):
+            expected_titles.add(planned_title.target.with_suffix(".mp3"))
+    for title in sorted(condensed_titles):
+        if title not in expected_titles:
+            plan.removals.append(title)
+            plan.removal_size += title.stat().st_size
+
+    return plan
+
+
+def link_duplicates(
+    plan: CondensePlan,
+    duplicate_groups: list[list[Path]],
+):
+    planned_titles = {
+        planned_title.source: planned_title for planned_title in plan.titles
+    }
+    for group in duplicate_groups:
+        group_titles = [
+            planned_titles[source] for source in group if source in planned_titles
+        ]
+        if len(group_titles) < 2:
+            continue
+        original = group_titles[0]
+        if original.action not in ("add", "transcode", "existing"):
+            continue
+        for planned_title in group_titles[1:]:
+            if planned_title.action in ("add", "transcode"):
+                planned_title.action = "link"
+                planned_title.original = original.target
+                planned_title.estimated_size = 0
+
+
+def log_plan(
+    plan: CondensePlan,
+    logger: Logger,
+):
+    for action in ("add", "transcode"):
+        for planned_title in plan.by_action(action):
+            logger.info(
+                f"{action}: {planned_title.target.as_posix()} (~{format_size(planned_title.estimated_size)})"
+            )
+    for planned_title in plan.by_action("link"):
+        logger.info(
+            f"link: {planned_title.target.as_posix()} = {planned_title.original.as_posix()}"
+        )
+    for title in plan.removals:
+        logger.info(f"remove: {title.as_posix()}")
+    for title in plan.outside_library:
+        logger.info(f"outside library: {title.as_posix()}")
+    logger.info(
+        "-----------------------------------------------------------------------------------------------------------"
+    )
+    logger.info(
+        f"{str(len(plan.by_action('add')))} title(s) to add (~{format_size(plan.estimated_size('add'))})"
+    )
+    logger.info(
+        f"{str(len(plan.by_action('transcode')))} title(s) to transcode (~{format_size(plan.estimated_size('transcode'))})"
+    )
+    logger.info(f"{str(len(plan.by_action('link')))} duplicate title(s) to link")
+    logger.info(
+        f"{str(len(plan.removals))} title(s) to remove ({format_size(plan.removal_size)})"
+    )
+    logger.info(
+        f"{str(len(plan.by_action('existing')) + plan.duplicates)} title(s) already exist"
+    )
+    logger.info(
+        f"{str(len(plan.by_action('missing')) + len(plan.by_action('error')) + len(plan.outside_library))} title(s) not found"
+    )
+    logger.info(
+        "-----------------------------------------------------------------------------------------------------------"
+    )
+
+
+def format_size(size: int) -> str:
+    return f"{size / 1_000_000:.1f} MB"
 
-    for title in current_titles:
-        if title not in all_titles:
+
+def remove_titles(plan: CondensePlan) -> int:
+    metrics = get_metrics()
+    count_removed = 0
+
+    with metrics.stage("remove"):
+        for title in plan.removals:
             Path.unlink(title)
             count_removed += 1
             print(str(title) + " removed.")
+    metrics.add("bytes_removed", plan.removal_size)
 
     return count_removed
 
@@ -34,127 +282,478 @@ def compress(
     quality: int,
     variable_bitrate: bool,
 ):
+    import ffmpeg
+
+    ffmpeg.input(str(source)).output(
+        str(target), **_compression_options(quality, variable_bitrate)
+    ).overwrite_output().run(quiet=True)
+
+
+def compress_batch(titles: list[tuple[Path, Path, int, bool]]):
+    import ffmpeg
+
+    inputs: dict[Path, tuple[int, ffmpeg.nodes.FilterableStream]] = {}
+    outputs = []
+    for source, target, quality, variable_bitrate in titles:
+        if source not in inputs:
+            inputs[source] = (len(inputs), ffmpeg.input(str(source)))
+        index, stream = inputs[source]
+        outputs.append(
+            ffmpeg.output(
+                stream["a"],
+                stream["v?"],
+                str(target),
+                map_metadata=str(index),
+                **_compression_options(quality, variable_bitrate),
+            )
+        )
+    ffmpeg.merge_outputs(*outputs).overwrite_output().run(quiet=True)
+
+
+def _compression_options(
+    quality: int,
+    variable_bitrate: bool,
+) -> dict[str, str]:
     if variable_bitrate:
-        ffmpeg.input(str(source)).output(
-            str(target), **{"c:v": "copy", "qscale:a": str(10 - quality)}
-        ).run(quiet=True)
-    else:
-        bitrate = str(quality * 32) + "k"
-        ffmpeg.input(str(source)).output(
-            str(target), audio_bitrate=bitrate, **{"c:v": "copy"}
-        ).run(quiet=True)
+        return {"c:v": "copy", "qscale:a": str(10 - quality)}
+    return {"audio_bitrate": str(quality * 32) + "k", "c:v": "copy"}
 
 
-def copy_titles(
-    playlists: list[Playlist],
-    logger: Logger,
-) -> tuple[int, int, int]:
-    library_config = get_config().library
-    condense_config = get_config().condense
-    all_titles: list[Path] = []
-    for playlist in playlists:
-        all_titles += playlist.content_paths()
-    count = 0
-    count_successfull = 0
-    count_existing = 0
-    count_not_found = 0
-    num_titles = len(all_titles)
+def fetch_cached(
+    planned_title: PlannedTitle,
+    condense_config: CondenseConfig,
+    transcode_cache: TranscodeCache,
+) -> str | None:
+    metrics = get_metrics()
+    planned_title.target.parent.mkdir(
+        parents=True,
+        exist_ok=True,
+    )
+    planned_title.target.unlink(missing_ok=True)
+    with metrics.stage("hash"):
+        cache_key = transcode_cache.key(
+            planned_title.source,
+            quality=condense_config.compression_quality,
+            variable_bitrate=condense_config.variable_bitrate,
+        )
+    with metrics.stage("copy"):
+        if not transcode_cache.fetch(cache_key, planned_title.target):
+            return cache_key
+    metrics.add("transcode_cache_hits")
+    return None
 
-    if not os.path.exists(library_config.condensed_location):
-        os.mkdir(library_config.condensed_location)
 
-    for title in all_titles:
-        count += 1
+def copy_title(
+    planned_title: PlannedTitle,
+    condense_config: CondenseConfig,
+    transcode_cache: TranscodeCache | None = None,
+) -> tuple[str, str]:
+    start = time.perf_counter()
+    result = _copy_title(planned_title, condense_config, transcode_cache)
+    if planned_title.action in ("add", "transcode"):
+        get_metrics().observe("title_seconds", time.perf_counter() - start)
+    return result
 
-        condensed_path = Path(
-            title.as_posix().replace(
-                Path(library_config.location).as_posix(),
-                Path(library_config.condensed_location).as_posix(),
-            )
+
+def _copy_title(
+    planned_title: PlannedTitle,
+    condense_config: CondenseConfig,
+    transcode_cache: TranscodeCache | None,
+) -> tuple[str, str]:
+    metrics = get_metrics()
+    title = planned_title.source
+    target = planned_title.target
+    if planned_title.action == "missing":
+        return ("not_found", f"{str(title)} does not exist!")
+    if planned_title.action == "error":
+        return ("not_found", f"Error copying {str(title)}: {planned_title.error}")
+    if planned_title.action == "existing":
+        return ("existing", f"{target.as_posix()} already exists!")
+    try:
+        target.parent.mkdir(
+            parents=True,
+            exist_ok=True,
         )
-        condensed_converted_path = condensed_path.with_suffix(".mp3")
-        if condensed_path.exists() or condensed_converted_path.exists():
-            log_str = f"{str(count)}/{str(num_titles)}: {condensed_path.as_posix()} already exists!"
-            count_existing += 1
-        else:
-            try:
-                condensed_path.parent.mkdir(
-                    parents=True,
-                    exist_ok=True,
+        if planned_title.action == "link":
+            if not planned_title.original.exists():
+                return (
+                    "not_found",
+                    f"{planned_title.original.as_posix()} to link {target.as_posix()} does not exist!",
                 )
-                if (
-                    condense_config.compress
-                    and MusicFile.from_file(title).quality
-                    > condense_config.compression_quality
-                ):
+            target.unlink(missing_ok=True)
+            with metrics.stage("copy"):
+                placement = place_file(planned_title.original, target, "hardlink")
+            metrics.add(f"placed_{placement}")
+            metrics.add("deduplicated")
+            return (
+                "successfull",
+                f"{target.as_posix()} linked to {planned_title.original.as_posix()}.",
+            )
+        if planned_title.action == "transcode":
+            target.unlink(missing_ok=True)
+            cache_key = None
+            if transcode_cache:
+                cache_key = fetch_cached(
+                    planned_title, condense_config, transcode_cache
+                )
+            if transcode_cache and not cache_key:
+                message = f"{target.as_posix()} added from transcode cache."
+            else:
+                with metrics.stage("transcode"):
                     compress(
                         source=title,
-                        target=condensed_converted_path,
+                        target=target,
                         quality=condense_config.compression_quality,
                         variable_bitrate=condense_config.variable_bitrate,
                     )
-                    log_str = f"{str(count)}/{str(num_titles)}: {condensed_path.as_posix()} compressed and added."
-                else:
-                    shutil.copy(str(title), str(condensed_path))
-                    log_str = f"{str(count)}/{str(num_titles)}: {condensed_path.as_posix()} added."
-                count_successfull += 1
-            except FileNotFoundError:
-                count_not_found += 1
-                log_str = (
-                    f"{str(count)}/{str(num_titles)}: {str(title)} does not exist!"
+                if transcode_cache:
+                    transcode_cache.store(cache_key, target)
+                message = f"{target.as_posix()} compressed and added."
+        else:
+            target.unlink(missing_ok=True)
+            with metrics.stage("copy"):
+                placement = place_file(title, target, condense_config.placement)
+            metrics.add(f"placed_{placement}")
+            message = f"{target.as_posix()} added."
+        metrics.add("bytes_in", planned_title.manifest_entry.size)
+        metrics.add("bytes_out", target.stat().st_size)
+        return ("successfull", message)
+    except FileNotFoundError:
+        return ("not_found", f"{str(title)} does not exist!")
+    except Exception as e:
+        return ("not_found", f"Error copying {str(title)}: {e}")
+
+
+def transcode_batch(
+    items: list[tuple[PlannedTitle, CondenseConfig, str | None]],
+    transcode_cache: TranscodeCache | None,
+) -> bool:
+    metrics = get_metrics()
+    start = time.perf_counter()
+    try:
+        for planned_title, _, _ in items:
+            planned_title.target.parent.mkdir(
+                parents=True,
+                exist_ok=True,
+            )
+            planned_title.target.unlink(missing_ok=True)
+        with metrics.stage("transcode"):
+            compress_batch(
+                titles=[
+                    (
+                        planned_title.source,
+                        planned_title.target,
+                        condense_config.compression_quality,
+                        condense_config.variable_bitrate,
+                    )
+                    for planned_title, condense_config, _ in items
+                ]
+            )
+        for planned_title, _, cache_key in items:
+            if transcode_cache and cache_key:
+                transcode_cache.store(cache_key, planned_title.target)
+    except Exception:
+        metrics.add("batch_fallbacks")
+        return False
+    elapsed = time.perf_counter() - start
+    sources = {planned_title.source for planned_title, _, _ in items}
+    for planned_title, _, _ in items:
+        metrics.add("bytes_out", planned_title.target.stat().st_size)
+        metrics.observe("title_seconds", elapsed / len(items))
+    for source in sources:
+        metrics.add("bytes_in", source.stat().st_size)
+    return True
+
+
+def copy_batch(
+    items: list[tuple[PlannedTitle, CondenseConfig]],
+    transcode_cache: TranscodeCache | None = None,
+) -> list[tuple[str, str]]:
+    results: dict[int, tuple[str, str]] = {}
+    cache_keys: dict[int, str | None] = {}
+    if len(items) > 1:
+        for i, (planned_title, condense_config) in enumerate(items):
+            cache_keys[i] = None
+            if not transcode_cache:
+                continue
+            try:
+                cache_keys[i] = fetch_cached(
+                    planned_title, condense_config, transcode_cache
                 )
-            except Exception as e:
-                count_not_found += 1
-                log_str = (
-                    f"{str(count)}/{str(num_titles)}: Error copying {str(title)}: {e}"
+            except Exception:
+                continue
+            if not cache_keys[i]:
+                del cache_keys[i]
+                results[i] = (
+                    "successfull",
+                    f"{planned_title.target.as_posix()} added from transcode cache.",
                 )
+    if len(cache_keys) > 1 and transcode_batch(
+        [(*items[i], cache_key) for i, cache_key in cache_keys.items()],
+        transcode_cache,
+    ):
+        for i in cache_keys:
+            results[i] = (
+                "successfull",
+                f"{items[i][0].target.as_posix()} compressed and added.",
+            )
+    for i, (planned_title, condense_config) in enumerate(items):
+        if i not in results:
+            results[i] = copy_title(planned_title, condense_config, transcode_cache)
+    return [results[i] for i in range(len(items))]
 
-        logger.info(log_str)
 
-    return (count_successfull, count_existing, count_not_found)
+def batch_titles(
+    targets: list[CondenseTarget],
+    batch_size: int,
+) -> list[list[tuple[CondenseTarget, PlannedTitle]]]:
+    transcodes: dict[str, list[tuple[CondenseTarget, PlannedTitle]]] = {}
+    for target in targets:
+        for planned_title in target.plan.by_action("transcode"):
+            transcodes.setdefault(planned_title.key, []).append((target, planned_title))
+    sources = list(transcodes.values())
+    batches = [
+        [item for source in sources[i : i + batch_size] for item in source]
+        for i in range(0, len(sources), batch_size)
+    ]
+    for target in targets:
+        batches += [
+            [(target, planned_title)]
+            for planned_title in target.plan.titles
+            if planned_title.action not in ("transcode", "link")
+        ]
+    return batches
 
 
-def copy_playlists(playlists: list[Playlist]):
-    library_config = get_config().library
-    for playlist in playlists:
-        condensed_playlist_path = Path(
-            playlist.path.as_posix().replace(
-                Path(library_config.location).as_posix(),
-                Path(library_config.condensed_location).as_posix(),
-            )
+def copy_titles(
+    targets: list[CondenseTarget],
+    logger: Logger,
+) -> list[tuple[int, int, int]]:
+    condense_config = get_config().condense
+    count = 0
+    counts = {
+        id(target): {
+            "successfull": 0,
+            "existing": target.plan.duplicates,
+            "not_found": len(target.plan.outside_library),
+        }
+        for target in targets
+    }
+    num_titles = sum(len(target.plan.titles) for target in targets)
+
+    for target in targets:
+        if not os.path.exists(target.location):
+            os.mkdir(target.location)
+        for title in target.plan.outside_library:
+            logger.info(f"{title.as_posix()} is outside the library!")
+
+    transcode_cache = None
+    if condense_config.transcode_cache_location and any(
+        target.condense_config.compress for target in targets
+    ):
+        transcode_cache = TranscodeCache.open(
+            Path(condense_config.transcode_cache_location),
+            max_size_mb=condense_config.transcode_cache_max_size,
+            placement=condense_config.placement,
+        )
+
+    def record(
+        target: CondenseTarget,
+        planned_title: PlannedTitle,
+        result: str,
+        message: str,
+    ):
+        nonlocal count
+        count += 1
+        counts[id(target)][result] += 1
+        if result != "not_found":
+            target.manifest.entries[planned_title.key] = planned_title.manifest_entry
+        else:
+            target.manifest.entries.pop(planned_title.key, None)
+        logger.info(f"{str(count)}/{str(num_titles)}: {message}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=condense_config.jobs) as executor:
+            futures = {
+                executor.submit(
+                    copy_batch,
+                    [
+                        (planned_title, target.condense_config)
+                        for target, planned_title in batch
+                    ],
+                    transcode_cache,
+                ): batch
+                for batch in batch_titles(targets, condense_config.transcode_batch_size)
+            }
+            for future in as_completed(futures):
+                for (target, planned_title), (result, message) in zip(
+                    futures[future], future.result()
+                ):
+                    record(target, planned_title, result, message)
+        for target in targets:
+            for planned_title in target.plan.by_action("link"):
+                record(
+                    target,
+                    planned_title,
+                    *copy_title(planned_title, target.condense_config),
+                )
+    finally:
+        for target in targets:
+            target.manifest.save()
+        if transcode_cache:
+            transcode_cache.close()
+
+    return [
+        (
+            counts[id(target)]["successfull"],
+            counts[id(target)]["existing"],
+            counts[id(target)]["not_found"],
         )
-        playlist.save(Path(condensed_playlist_path))
+        for target in targets
+    ]
+
+
+def copy_playlists(
+    playlists: list[Playlist],
+    library_config: LibraryConfig | None = None,
+):
+    library_config = library_config or get_config().library
+    with get_metrics().stage("playlist_write"):
+        path_mapper = PathMapper(
+            Path(library_config.location),
+            Path(library_config.condensed_location),
+        )
+        for playlist in playlists:
+            playlist.save(path_mapper.map(playlist.path))
+
+
+def write_target_playlists(
+    playlists: list[Playlist],
+    target: CondenseTarget,
+):
+    target_playlists = [copy.copy(playlist) for playlist in playlists]
+    for playlist in target_playlists:
+        playlist.condense(
+            location=Path(target.library_config.location),
+            condensed_location=Path(target.location),
+            format=".mp3" if target.condense_config.compress else None,
+        )
+    copy_playlists(target_playlists, target.library_config)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="print the add, transcode and remove plan without changing anything",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and condense library changes as they happen",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=2.0,
+        help="seconds without further changes before a watch update starts",
+    )
+    add_instrumentation_arguments(parser, "condense")
+
+
+def run(args: argparse.Namespace):
+    with instrumented(args):
+        _condense(args)
 
 
 def condense():
+    parser = argparse.ArgumentParser(prog="condense")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+def _condense(args: argparse.Namespace):
+    metrics = get_metrics()
     condense_config = get_config().condense
     library_config = get_config().library
 
     logger = get_logger()
-    playlists = get_playlists(Path(library_config.location))
-    count_successfull, count_existing, count_not_found = copy_titles(
-        playlists=playlists,
-        logger=logger,
-    )
-    for playlist in playlists:
-        playlist.condense(
-            location=Path(library_config.location),
-            condensed_location=Path(library_config.condensed_location),
-            format=".mp3" if condense_config.compress else None,
+    with metrics.stage("playlist_read"):
+        playlists = get_playlists(Path(library_config.location))
+    targets = [
+        CondenseTarget(
+            library_config=target_library_config,
+            condense_config=target_condense_config,
+            manifest=CondenseManifest.from_file(
+                Path(target_library_config.condensed_location)
+            ),
         )
-    count_removed = remove_titles(playlists)
-    copy_playlists(playlists)
+        for target_library_config, target_condense_config in condense_config.targets_for(
+            library_config
+        )
+    ]
+    with MusicFile.indexed(Path(library_config.location), read_only=args.dry_run):
+        duplicate_groups = None
+        if condense_config.deduplicate:
+            duplicate_groups = find_duplicates(
+                {title for playlist in playlists for title in playlist.content_paths()},
+                jobs=condense_config.jobs,
+                index=MusicFile.index,
+            )
+        with metrics.stage("plan"):
+            for target in targets:
+                target.plan = plan_condense(
+                    playlists=playlists,
+                    manifest=target.manifest,
+                    library_config=target.library_config,
+                    condense_config=target.condense_config,
+                    duplicate_groups=duplicate_groups,
+                )
+    if args.dry_run:
+        for target in targets:
+            if len(targets) > 1:
+                logger.info(f"Target {target.location}:")
+            log_plan(target.plan, logger)
+        return
 
+    for target in targets:
+        target.manifest.retain(
+            {planned_title.key for planned_title in target.plan.titles}
+        )
+    with metrics.stage("place"):
+        target_counts = copy_titles(
+            targets=targets,
+            logger=logger,
+        )
+    for target, (count_successfull, count_existing, count_not_found) in zip(
+        targets, target_counts
+    ):
+        count_removed = remove_titles(target.plan)
+        write_target_playlists(playlists, target)
+
+        logger.info(
+            "-----------------------------------------------------------------------------------------------------------"
+        )
+        if len(targets) > 1:
+            logger.info(f"Target {target.location}:")
+        logger.info(f"{str(count_removed)} title(s) removed")
+        logger.info(f"{str(count_successfull)} title(s) added")
+        logger.info(f"{str(count_existing)} title(s) already exist")
+        logger.info(f"{str(count_not_found)} title(s) not found")
     logger.info(
         "-----------------------------------------------------------------------------------------------------------"
     )
-    logger.info(f"{str(count_removed)} title(s) removed")
-    logger.info(f"{str(count_successfull)} title(s) added")
-    logger.info(f"{str(count_existing)} title(s) already exist")
-    logger.info(f"{str(count_not_found)} title(s) not found")
-    logger.info(
-        "-----------------------------------------------------------------------------------------------------------"
-    )
+
+    if args.watch:
+        from musictools.condense_watch import watch_condense
+
+        watch_condense(
+            library_config=library_config,
+            targets=targets,
+            playlists=playlists,
+            logger=logger,
+            debounce=args.debounce,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,222 @@
+import os
+from logging import Logger
+from pathlib import Path
+from musictools import SUPPORTED_FORMATS
+from musictools.common.utils.file_watcher import create_watcher
+from musictools.common.utils.metrics import get_metrics
+from musictools.common.utils.path_mapper import PathMapper
+from musictools.common.utils.tag_index import INDEX_FILENAME
+from musictools.common.value_objects.condense_manifest import MANIFEST_FILENAME
+from musictools.common.value_objects.condense_plan import CondensePlan
+from musictools.common.value_objects.condense_target import CondenseTarget
+from musictools.common.value_objects.music_file import MusicFile
+from musictools.common.value_objects.playlist import Playlist
+from musictools.condense import (
+    copy_titles,
+    plan_title,
+    remove_titles,
+    write_target_playlists,
+)
+from musictools.config import LibraryConfig
+
+PLAYLIST_SUFFIXES = (".m3u", ".m3u8")
+
+
+class IncrementalCondenser:
+    def __init__(
+        self,
+        library_config: LibraryConfig,
+        targets: list[CondenseTarget],
+        playlists: list[Playlist],
+        logger: Logger,
+    ):
+        self.library_config = library_config
+        self.location = Path(library_config.location)
+        self.targets = targets
+        self.logger = logger
+        self.tracks: dict[Path, MusicFile] = {}
+        self.playlists = {playlist.path: playlist for playlist in playlists}
+        for playlist in playlists:
+            for title in playlist.content:
+                self.tracks.setdefault(title.path, title)
+        self.titles = self._referenced_titles()
+
+    def _key(
+        self,
+        title: Path,
+    ) -> str | None:
+        if not title.is_relative_to(self.location):
+            return None
+        return title.relative_to(self.location).as_posix()
+
+    def _referenced_titles(self) -> dict[str, Path]:
+        titles: dict[str, Path] = {}
+        for playlist in self.playlists.values():
+            for title in playlist.content_paths():
+                key = self._key(title)
+                if key is not None:
+                    titles.setdefault(key, title)
+        return titles
+
+    def _is_relevant(
+        self,
+        path: Path,
+    ) -> bool:
+        if path == self.location:
+            return True
+        if self.location not in path.parents:
+            return False
+        if path.name in (INDEX_FILENAME, MANIFEST_FILENAME):
+            return False
+        for target in self.targets:
+            condensed_location = Path(target.location)
+            if path == condensed_location or condensed_location in path.parents:
+                return False
+        if path.suffix[1:] in SUPPORTED_FORMATS or path.suffix in PLAYLIST_SUFFIXES:
+            return True
+        return not path.is_file()
+
+    def _plan_target(
+        self,
+        target: CondenseTarget,
+        affected: set[str],
+        gone: set[str],
+    ) -> CondensePlan:
+        plan = CondensePlan()
+        stale_outputs: set[str] = set()
+        for key in sorted(affected):
+            manifest_entry = target.manifest.entries.get(key)
+            planned_title = plan_title(
+                key=key,
+                title=self.titles[key],
+                library_config=target.library_config,
+                condense_config=target.condense_config,
+                manifest_entry=manifest_entry,
+            )
+            plan.titles.append(planned_title)
+            if (
+                manifest_entry
+                and Path(target.location) / manifest_entry.output
+                != planned_title.target
+            ):
+                stale_outputs.add(manifest_entry.output)
+        for key in gone:
+            manifest_entry = target.manifest.entries.pop(key, None)
+            if manifest_entry:
+                stale_outputs.add(manifest_entry.output)
+        for output in sorted(stale_outputs):
+            stale_path = Path(target.location) / output
+            if stale_path.exists():
+                plan.removals.append(stale_path)
+                plan.removal_size += stale_path.stat().st_size
+        return plan
+
+    def apply(
+        self,
+        changes: set[Path],
+    ):
+        changes = {path for path in changes if self._is_relevant(path)}
+        if not changes:
+            return
+        rescan = self.location in changes
+        playlist_paths = {
+            path
+            for path in changes
+            if path.parent == self.location and path.suffix in PLAYLIST_SUFFIXES
+        }
+        if rescan:
+            playlist_paths |= set(self.playlists)
+            playlist_paths |= {
+                self.location / item
+                for item in os.listdir(self.location)
+                if item.endswith(PLAYLIST_SUFFIXES)
+            }
+
+        for path in playlist_paths:
+            if path.exists():
+                self.playlists[path] = Playlist.from_file(
+                    path=path,
+                    title_prefix_path=self.location,
+                    tracks=self.tracks,
+                )
+            else:
+                self.playlists.pop(path, None)
+        previous_titles = self.titles
+        self.titles = self._referenced_titles()
+        gone = previous_titles.keys() - self.titles.keys()
+        for key in gone:
+            self.tracks.pop(previous_titles[key], None)
+
+        affected = {key for key in self.titles if key not in previous_titles}
+        prefixes: list[str] = []
+        for path in changes - playlist_paths:
+            if path == self.location:
+                continue
+            key = self._key(path)
+            if key in self.titles:
+                affected.add(key)
+            elif path.suffix[1:] not in SUPPORTED_FORMATS:
+                prefixes.append(key + "/")
+        if rescan:
+            affected = set(self.titles)
+        elif prefixes:
+            affected |= {key for key in self.titles if key.startswith(tuple(prefixes))}
+
+        with MusicFile.indexed(self.location):
+            for target in self.targets:
+                target.plan = self._plan_target(target, affected, gone)
+
+        copy_titles(targets=self.targets, logger=self.logger)
+        count_removed = 0
+        for target in self.targets:
+            count_removed += remove_titles(target.plan)
+            write_target_playlists(
+                [
+                    self.playlists[path]
+                    for path in playlist_paths
+                    if path in self.playlists
+                ],
+                target,
+            )
+            path_mapper = PathMapper(self.location, Path(target.location))
+            for path in playlist_paths:
+                if path not in self.playlists:
+                    path_mapper.map(path).unlink(missing_ok=True)
+        self.logger.info(
+            f"{str(len(affected))} title(s) updated, {str(count_removed)} title(s) removed, "
+            f"{str(len(playlist_paths))} playlist(s) changed"
+        )
+
+
+def watch_condense(
+    library_config: LibraryConfig,
+    targets: list[CondenseTarget],
+    playlists: list[Playlist],
+    logger: Logger,
+    debounce: float,
+):
+    condenser = IncrementalCondenser(
+        library_config=library_config,
+        targets=targets,
+        playlists=playlists,
+        logger=logger,
+    )
+    watcher = create_watcher(Path(library_config.location))
+    logger.info(f"Watching {library_config.location} for changes...")
+    rescan = False
+    try:
+        while True:
+            changes = watcher.wait_for_changes(debounce)
+            if rescan:
+                changes.add(Path(library_config.location))
+            try:
+                with get_metrics().stage("watch_update"):
+                    condenser.apply(changes)
+                rescan = False
+            except Exception as e:
+                logger.info(f"Could not apply changes, rescanning on the next one: {e}")
+                rescan = True
+    except KeyboardInterrupt:
+        logger.info("Stopped watching")
+    finally:
+        watcher.close()
@@ -1,10 +1,39 @@
 import json
-from dataclasses import dataclass
+import os
+import threading
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
 from typing import Any
 
+CONFIG_ENVIRONMENT_VARIABLE = "MUSICTOOLS_CONFIG"
+OVERRIDE_PREFIX = "MUSICTOOLS_"
 
-def get_config(filename: str | None = "config.json") -> "ProgramConfig":
-    return ProgramConfig.load(filename)
+_config_path: str | None = None
+_configs: dict[Path, "ProgramConfig"] = {}
+_configs_lock = threading.Lock()
+
+
+def set_config_path(filename: str | None):
+    global _config_path
+    _config_path = filename
+
+
+def get_config(filename: str | None = None) -> "ProgramConfig":
+    filename = (
+        filename
+        or _config_path
+        or os.environ.get(CONFIG_ENVIRONMENT_VARIABLE)
+        or "config.json"
+    )
+    path = Path(filename).resolve()
+    config = _configs.get(path)
+    if config is None:
+        with _configs_lock:
+            config = _configs.get(path)
+            if config is None:
+                config = ProgramConfig.load(str(path))
+                _configs[path] = config
+    return config
 
 
 class ConfigError(Exception): ...
@@ -18,9 +47,13 @@ class Config:
         config_dict: dict[str, Any],
         content_type: type,
         options: list[Any] | None = None,
+        minimum: int | None = None,
+        required: bool = True,
     ):
         content = config_dict.get(name)
         if content is None:
+            if not required:
+                return
             raise ConfigError(f'Config field "{name}" is missing')
         if not isinstance(content, content_type):
             raise ConfigError(
@@ -31,6 +64,10 @@ class Config:
                 raise ConfigError(
                     f'Value of config field "{name}" is "{content}" but should be one of {options}'
                 )
+        if minimum is not None and content < minimum:
+            raise ConfigError(
+                f'Value of config field "{name}" is "{content}" but should be at least {minimum}'
+            )
         return
 
     @classmethod
@@ -40,6 +77,33 @@ class Config:
     ):
         return
 
+    @classmethod
+    def apply_overrides(
+        cls,
+        section: str,
+        config_dict: dict[str, Any],
+        environment: dict[str, str],
+    ):
+        prefix = f"{OVERRIDE_PREFIX}{section.upper()}_"
+        field_types = {field.name: type(field.default) for field in fields(cls)}
+        for variable, value in environment.items():
+            if not variable.startswith(prefix):
+                continue
+            name = variable[len(prefix) :].lower()
+            if name not in field_types:
+                raise ConfigError(
+                    f'Environment variable "{variable}" does not match a config field'
+                )
+            if field_types[name] is str:
+                config_dict[name] = value
+                continue
+            try:
+                config_dict[name] = json.loads(value)
+            except ValueError:
+                raise ConfigError(
+                    f'Environment variable "{variable}" has invalid value "{value}"'
+                )
+
     @classmethod
     def load(
         cls,
@@ -76,6 +140,21 @@ class CondenseConfig(Config):
     compress: bool = False
     compression_quality: int = 10
     variable_bitrate: bool = True
+    jobs: int = os.cpu_count() or 1
+    transcode_batch_size: int = 1
+    placement: str = "copy"
+    deduplicate: bool = False
+    transcode_cache_location: str = ""
+    transcode_cache_max_size: int = 10000
+    targets: list[dict[str, Any]] = field(default_factory=list)
+
+    TARGET_FIELDS = [
+        "condensed_location",
+        "compress",
+        "compression_quality",
+        "variable_bitrate",
+        "placement",
+    ]
 
     @classmethod
     def validate(
@@ -98,12 +177,106 @@ class CondenseConfig(Config):
             config_dict=config_dict,
             content_type=type(cls.variable_bitrate),
         )
+        cls._validate_field(
+            name="jobs",
+            config_dict=config_dict,
+            content_type=type(cls.jobs),
+            minimum=1,
+            required=False,
+        )
+        cls._validate_field(
+            name="transcode_batch_size",
+            config_dict=config_dict,
+            content_type=type(cls.transcode_batch_size),
+            minimum=1,
+            required=False,
+        )
+        cls._validate_field(
+            name="placement",
+            config_dict=config_dict,
+            content_type=type(cls.placement),
+            options=["copy", "hardlink", "reflink", "copy_file_range"],
+            required=False,
+        )
+        cls._validate_field(
+            name="deduplicate",
+            config_dict=config_dict,
+            content_type=type(cls.deduplicate),
+            required=False,
+        )
+        cls._validate_field(
+            name="transcode_cache_location",
+            config_dict=config_dict,
+            content_type=type(cls.transcode_cache_location),
+            required=False,
+        )
+        cls._validate_field(
+            name="transcode_cache_max_size",
+            config_dict=config_dict,
+            content_type=type(cls.transcode_cache_max_size),
+            minimum=0,
+            required=False,
+        )
+        cls._validate_field(
+            name="targets",
+            config_dict=config_dict,
+            content_type=list,
+            required=False,
+        )
+        for target in config_dict.get("targets") or []:
+            if not isinstance(target, dict):
+                raise ConfigError(
+                    f"Condense target has type {type(target).__name__} but should be of type dict"
+                )
+            for name in target:
+                if name not in cls.TARGET_FIELDS:
+                    raise ConfigError(
+                        f'Condense target field "{name}" should be one of {cls.TARGET_FIELDS}'
+                    )
+            cls._validate_field(
+                name="condensed_location",
+                config_dict=target,
+                content_type=str,
+            )
+            target_dict = {
+                name: value for name, value in config_dict.items() if name != "targets"
+            }
+            target_dict.update(target)
+            target_dict.pop("condensed_location")
+            cls.validate(target_dict)
+
+    @property
+    def fingerprint(self) -> str:
+        return f"compress={self.compress};quality={self.compression_quality};vbr={self.variable_bitrate}"
+
+    def targets_for(
+        self,
+        library_config: "LibraryConfig",
+    ) -> list[tuple["LibraryConfig", "CondenseConfig"]]:
+        if not self.targets:
+            return [(library_config, self)]
+        condense_targets: list[tuple[LibraryConfig, CondenseConfig]] = []
+        for target in self.targets:
+            settings = dict(target)
+            condensed_location = settings.pop("condensed_location")
+            condense_targets.append(
+                (
+                    replace(library_config, condensed_location=condensed_location),
+                    replace(self, targets=[], **settings),
+                )
+            )
+        return condense_targets
 
 
 @dataclass
 class DownloadConfig(Config):
     location: str = ""
     preferred_format: str = "lossless"
+    jobs: int = 4
+    page_cache_max_age: int = 86400
+    requests_per_second: int = 8
+    max_retries: int = 5
+    read_timeout: int = 30
 
     @classmethod
     def validate(
@@ -121,11 +294,49 @@ class DownloadConfig(Config):
             config_dict=config_dict,
             content_type=type(cls.location),
         )
+        cls._validate_field(
+            name="jobs",
+            config_dict=config_dict,
+            content_type=type(cls.jobs),
+            minimum=1,
+            required=False,
+        )
+        cls._validate_field(
+            name="page_cache_max_age",
+            config_dict=config_dict,
+            content_type=type(cls.page_cache_max_age),
+            minimum=0,
+            required=False,
+        )
+        cls._validate_field(
+            name="requests_per_second",
+            config_dict=config_dict,
+            content_type=type(cls.requests_per_second),
+            minimum=1,
+            required=False,
+        )
+        cls._validate_field(
+            name="max_retries",
+            config_dict=config_dict,
+            content_type=type(cls.max_retries),
+            minimum=0,
+            required=False,
+        )
+        cls._validate_field(
+            name="read_timeout",
+            config_dict=config_dict,
+            content_type=type(cls.read_timeout),
+            minimum=1,
+            required=False,
+        )
 
 
 @dataclass
 class ExportConfig(Config):
     location: str = ""
+    format: str = "json"
+    layout: str = "embedded"
+    jobs: int = os.cpu_count() or 1
 
     @classmethod
     def validate(
@@ -137,6 +348,27 @@ class ExportConfig(Config):
             config_dict=config_dict,
             content_type=type(cls.location),
         )
+        cls._validate_field(
+            name="format",
+            config_dict=config_dict,
+            content_type=type(cls.format),
+            options=["json", "ndjson"],
+            required=False,
+        )
+        cls._validate_field(
+            name="layout",
+            config_dict=config_dict,
+            content_type=type(cls.layout),
+            options=["embedded", "normalized"],
+            required=False,
+        )
+        cls._validate_field(
+            name="jobs",
+            config_dict=config_dict,
+            content_type=type(cls.jobs),
+            minimum=1,
+            required=False,
+        )
 
 
 @dataclass
@@ -153,6 +385,18 @@ class ProgramConfig(Config):
     ) -> "Config":
         with open(filename, "rt") as config_file:
             config_dict = json.loads(config_file.read())
+        sections: dict[str, type[Config]] = {
+            "library": LibraryConfig,
+            "condense": CondenseConfig,
+            "download": DownloadConfig,
+            "export": ExportConfig,
+        }
+        for section, section_type in sections.items():
+            section_type.apply_overrides(
+                section,
+                config_dict.setdefault(section, {}),
+                dict(os.environ),
+            )
         return cls(
             library=LibraryConfig.load(config_dict.get("library")),
             condense=CondenseConfig.load(config_dict.get("condense")),
@@ -1,20 +1,169 @@
-import sys
-from musictools.khi_scraper import KHIScraper
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from logging import Logger
+from pathlib import Path
+from musictools.khi_scraper import KHIScraper, create_scheduler
 from musictools import get_logger
+from musictools.common.utils.metrics import (
+    add_instrumentation_arguments,
+    get_metrics,
+    instrumented,
+)
+from musictools.common.value_objects.download_queue import DownloadQueue, QueuedAlbum
+from musictools.config import get_config
+
+
+@dataclass
+class AlbumJob:
+    album: QueuedAlbum
+    scraper: KHIScraper
+    download_path: Path
+    titles: deque[tuple[int, str]]
+    outstanding: int
+    failed: bool = False
+
+
+def read_queue_file(path: Path) -> list[str]:
+    with open(path, "rt") as queue_file:
+        lines = [line.strip() for line in queue_file.readlines()]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def download_albums(
+    queue: DownloadQueue,
+    logger: Logger,
+):
+    download_config = get_config().download
+    scheduler = create_scheduler(download_config.jobs)
+    jobs: deque[AlbumJob] = deque()
+    resolving: dict[Future[KHIScraper], QueuedAlbum] = {}
+    in_flight: dict[Future[tuple[bool, str]], tuple[AlbumJob, int]] = {}
+
+    def finish(job: AlbumJob):
+        queue.mark_status(job.album, "failed" if job.failed else "done")
+        logger.info(
+            f"[{job.scraper.album_name}] {'Incomplete' if job.failed else 'Finished'}"
+        )
+
+    with ThreadPoolExecutor(max_workers=download_config.jobs) as executor:
+        for album in queue.pending():
+            future = executor.submit(
+                KHIScraper,
+                album.url,
+                jobs=download_config.jobs,
+                scheduler=scheduler,
+            )
+            resolving[future] = album
+
+        while resolving or in_flight or jobs:
+            while jobs and len(in_flight) < 2 * download_config.jobs:
+                job = jobs.popleft()
+                i, url = job.titles.popleft()
+                future = executor.submit(
+                    job.scraper.download_title,
+                    i,
+                    url,
+                    job.download_path,
+                    download_config.preferred_format,
+                )
+                in_flight[future] = (job, i)
+                if job.titles:
+                    jobs.append(job)
+
+            done, _ = wait(
+                [*resolving, *in_flight],
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                if future in resolving:
+                    album = resolving.pop(future)
+                    try:
+                        scraper = future.result()
+                    except Exception as e:
+                        logger.info(f"Could not resolve album {album.url}: {e}")
+                        queue.mark_status(album, "failed")
+                        continue
+                    completed = set(album.completed)
+                    titles = deque(
+                        (i, url)
+                        for i, url in enumerate(scraper.title_urls, start=1)
+                        if i not in completed
+                    )
+                    job = AlbumJob(
+                        album=album,
+                        scraper=scraper,
+                        download_path=scraper.download_path(),
+                        titles=titles,
+                        outstanding=len(titles),
+                    )
+                    logger.info(
+                        f"[{scraper.album_name}] {str(len(titles))} of {str(len(scraper.title_urls))} title(s) queued"
+                    )
+                    if titles:
+                        jobs.append(job)
+                    else:
+                        finish(job)
+                else:
+                    job, i = in_flight.pop(future)
+                    success, message = future.result()
+                    job.outstanding -= 1
+                    if success:
+                        queue.mark_completed(job.album, i)
+                    else:
+                        job.failed = True
+                    logger.info(f"[{job.scraper.album_name}] {message}")
+                    if not job.outstanding:
+                        finish(job)
+                queue.save()
+
+    logger.info(scheduler.report())
+    metrics = get_metrics()
+    for name, value in asdict(scheduler.stats).items():
+        metrics.add(name, value)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "urls",
+        nargs="*",
+        help="album URLs to download",
+    )
+    parser.add_argument(
+        "--queue",
+        type=Path,
+        help="file with one album URL per line",
+    )
+    add_instrumentation_arguments(parser, "download")
+
+
+def run(args: argparse.Namespace):
+    with instrumented(args):
+        _download(args)
 
 
 def download():
-    url = sys.argv[1]
+    parser = argparse.ArgumentParser(prog="download")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+def _download(args: argparse.Namespace):
+    download_config = get_config().download
     logger = get_logger()
 
-    if "khinsider" in url:
-        scraper = KHIScraper(
-            url,
-            logger=logger,
-        )
-        scraper.download()
-    else:
-        raise ValueError(f"Could not parse url: {url}")
+    urls = list(args.urls)
+    if args.queue:
+        urls += read_queue_file(args.queue)
+    for url in urls:
+        if "khinsider" not in url:
+            raise ValueError(f"Could not parse url: {url}")
+
+    queue = DownloadQueue.from_file(Path(download_config.location))
+    queue.add(urls)
+    queue.save()
+    download_albums(queue, logger)
 
     print("Download finished!")
 
@@ -0,0 +1,75 @@
+import argparse
+import json
+from pathlib import Path
+from musictools import get_logger
+from musictools.common.utils.duplicates import find_duplicates
+from musictools.common.utils.file_utils import iter_titles
+from musictools.common.utils.metrics import (
+    add_instrumentation_arguments,
+    get_metrics,
+    instrumented,
+)
+from musictools.common.value_objects.music_file import MusicFile
+from musictools.condense import format_size
+from musictools.config import get_config
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--report",
+        help="also write the duplicate groups as JSON to this file",
+    )
+    add_instrumentation_arguments(parser, "duplicates")
+
+
+def run(args: argparse.Namespace):
+    with instrumented(args):
+        _duplicates(args)
+
+
+def duplicates():
+    parser = argparse.ArgumentParser(prog="duplicates")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+def _duplicates(args: argparse.Namespace):
+    library_config = get_config().library
+    jobs = get_config().condense.jobs
+    location = Path(library_config.location)
+    logger = get_logger()
+
+    with MusicFile.indexed(location):
+        groups = find_duplicates(
+            get_metrics().timed("scan", iter_titles(location, jobs)),
+            jobs=jobs,
+            index=MusicFile.index,
+        )
+    reclaimable_size = 0
+    for group in groups:
+        logger.info(group[0].relative_to(location).as_posix())
+        for path in group[1:]:
+            logger.info(f"  = {path.relative_to(location).as_posix()}")
+        reclaimable_size += group[0].stat().st_size * (len(group) - 1)
+    logger.info(
+        "-----------------------------------------------------------------------------------------------------------"
+    )
+    logger.info(
+        f"{str(sum(len(group) - 1 for group in groups))} duplicate title(s) in {str(len(groups))} group(s) ({format_size(reclaimable_size)})"
+    )
+
+    if args.report:
+        with open(args.report, "wt") as report_file:
+            report_file.write(
+                json.dumps(
+                    obj=[
+                        [path.relative_to(location).as_posix() for path in group]
+                        for group in groups
+                    ],
+                    indent=2,
+                )
+            )
+
+
+if __name__ == "__main__":
+    duplicates()
@@ -1,81 +1,434 @@
-import json
+import argparse
+import hashlib
+import os
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future
 from pathlib import Path
-from musictools.common.utils.file_utils import get_playlists, list_titles
+from typing import Any
+from musictools.common.utils.export_writer import EXPORT_WRITERS, ExportWriter
+from musictools.common.utils.file_utils import (
+    get_playlists,
+    iter_playlists,
+    iter_titles,
+)
+from musictools.common.utils.metrics import (
+    add_instrumentation_arguments,
+    get_metrics,
+    instrumented,
+)
+from musictools.common.utils.tag_reader import TagReader
+from musictools.common.value_objects.export_state import ExportState, ExportStateEntry
 from musictools.common.value_objects.music_file import MusicFile
+from musictools.common.value_objects.playlist import Playlist
+from musictools.common.value_objects.track_tags import TrackTags
 from musictools.config import get_config
 
+PENDING_TAG_READS_PER_JOB = 4
 
-def generate_library_dict(library_location: Path) -> dict[str, dict[str, str]]:
-    titles = list_titles(library_location)
-    library_dict = {}
-    i = 0
-
-    for title in titles:
-        music_file = MusicFile.from_file(title)
-        music_file.load()
-        title_dict = {
-            "artist": music_file.artist,
-            "album": music_file.album,
-            "title": music_file.title,
-            "track": music_file.track,
-            "genre": music_file.genre,
-        }
-        library_dict[f"title_{str(i)}"] = title_dict
-        i += 1
 
-    return library_dict
+def title_dict(tags: TrackTags) -> dict[str, Any]:
+    return {
+        "artist": tags.artist,
+        "album": tags.album,
+        "title": tags.title,
+        "track": tags.track,
+        "genre": tags.genre,
+    }
+
+
+def title_id(
+    title: Path,
+    library_location: Path,
+) -> str | None:
+    if not title.is_relative_to(library_location):
+        return None
+    return hashlib.sha1(
+        title.relative_to(library_location).as_posix().encode()
+    ).hexdigest()[:16]
+
+
+def playlist_title_ids(
+    playlist: Playlist,
+    library_location: Path,
+) -> list[str]:
+    keys = [title_id(title.path, library_location) for title in playlist.content]
+    return [key for key in keys if key is not None]
+
+
+def iter_library_tags(
+    library_location: Path,
+    tag_reader: TagReader,
+    jobs: int = 1,
+) -> Iterator[tuple[Path, TrackTags]]:
+    futures: deque[tuple[Path, Future[TrackTags]]] = deque()
+    max_pending = jobs * PENDING_TAG_READS_PER_JOB
+    for title in get_metrics().timed("scan", iter_titles(library_location, jobs)):
+        futures.append((title, tag_reader.submit(title)))
+        while futures and (futures[0][1].done() or len(futures) >= max_pending):
+            title, future = futures.popleft()
+            yield (title, future.result())
+    while futures:
+        title, future = futures.popleft()
+        yield (title, future.result())
+
+
+def iter_library_entries(
+    library_location: Path,
+    tag_reader: TagReader,
+    jobs: int = 1,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    for i, (_, tags) in enumerate(
+        iter_library_tags(library_location, tag_reader, jobs)
+    ):
+        yield (f"title_{str(i)}", title_dict(tags))
+
+
+def iter_normalized_library_entries(
+    library_location: Path,
+    tag_reader: TagReader,
+    jobs: int = 1,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    for title, tags in iter_library_tags(library_location, tag_reader, jobs):
+        yield (
+            title_id(title, library_location),
+            {
+                "path": title.relative_to(library_location).as_posix(),
+                **title_dict(tags),
+            },
+        )
+
 
+def iter_playlist_entries(
+    playlist: Playlist,
+    tag_reader: TagReader,
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    futures = [tag_reader.submit(title.path) for title in playlist.content]
+    for i, (title, future) in enumerate(zip(playlist.content, futures)):
+        title.tags = future.result()
+        yield (f"title_{str(i)}", title_dict(title.tags))
 
-def generate_playlists_dict(library_location: Path) -> dict[str, dict[str, str]]:
-    playlists = get_playlists(library_location)
-    playlists_dict = {}
 
+def write_library(
+    library_location: Path,
+    tag_reader: TagReader,
+    writer: ExportWriter,
+    jobs: int = 1,
+):
+    metrics = get_metrics()
+    for key, entry in iter_library_entries(library_location, tag_reader, jobs):
+        with metrics.stage("write"):
+            writer.write_entry(key, entry)
+    with metrics.stage("write"):
+        writer.close()
+
+
+def write_normalized_library(
+    library_location: Path,
+    tag_reader: TagReader,
+    writer: ExportWriter,
+    jobs: int = 1,
+):
+    metrics = get_metrics()
+    for key, entry in iter_normalized_library_entries(
+        library_location, tag_reader, jobs
+    ):
+        with metrics.stage("write"):
+            writer.write_entry(key, entry)
+    with metrics.stage("write"):
+        writer.close()
+
+
+def write_playlists(
+    library_location: Path,
+    playlists: list[Playlist],
+    tag_reader: TagReader,
+    writer: ExportWriter,
+):
+    metrics = get_metrics()
+    for playlist in playlists:
+        with metrics.stage("write"):
+            writer.begin_group(playlist.name)
+        for key, entry in iter_playlist_entries(playlist, tag_reader):
+            with metrics.stage("write"):
+                writer.write_entry(key, entry)
+        with metrics.stage("write"):
+            writer.end_group()
+    with metrics.stage("write"):
+        writer.close()
+
+
+def write_normalized_playlists(
+    library_location: Path,
+    playlists: list[Playlist],
+    tag_reader: TagReader,
+    writer: ExportWriter,
+):
+    metrics = get_metrics()
     for playlist in playlists:
-        playlist_dict = {}
-        i = 0
+        titles = playlist_title_ids(playlist, library_location)
+        with metrics.stage("write"):
+            writer.write_entry(playlist.name, {"titles": titles})
+    with metrics.stage("write"):
+        writer.close()
+
+
+def update_library_state(
+    library_location: Path,
+    state: ExportState,
+    tag_reader: TagReader,
+    jobs: int = 1,
+) -> list[tuple[str, str, ExportStateEntry]]:
+    changes: list[tuple[str, str, ExportStateEntry]] = []
+    pending: deque[tuple[str, Path, os.stat_result, Future[TrackTags]]] = deque()
+    seen: set[str] = set()
+    max_pending = jobs * PENDING_TAG_READS_PER_JOB
+
+    def finish(
+        key: str,
+        title: Path,
+        stat: os.stat_result,
+        future: Future[TrackTags],
+    ):
+        entry = ExportStateEntry(
+            path=title.relative_to(library_location).as_posix(),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            tags=title_dict(future.result()),
+        )
+        previous_entry = state.titles.get(key)
+        state.titles[key] = entry
+        if previous_entry is None:
+            changes.append((key, "added", entry))
+        elif previous_entry.tags != entry.tags or previous_entry.path != entry.path:
+            changes.append((key, "changed", entry))
+
+    for title in get_metrics().timed("scan", iter_titles(library_location, jobs)):
+        key = title_id(title, library_location)
+        seen.add(key)
+        stat = title.stat()
+        previous_entry = state.titles.get(key)
+        if previous_entry and previous_entry.matches(stat):
+            continue
+        pending.append((key, title, stat, tag_reader.submit(title)))
+        while pending and (pending[0][3].done() or len(pending) >= max_pending):
+            finish(*pending.popleft())
+    while pending:
+        finish(*pending.popleft())
+    for key in [key for key in state.titles if key not in seen]:
+        changes.append((key, "removed", state.titles.pop(key)))
+    return changes
 
-        for title in playlist.content:
-            title.load()
-            title_dict = {
-                "artist": title.artist,
-                "album": title.album,
-                "title": title.title,
-                "track": title.track,
-                "genre": title.genre,
-            }
-            playlist_dict[f"title_{str(i)}"] = title_dict
-            i += 1
 
-        playlists_dict[playlist.name] = playlist_dict
+def update_playlist_state(
+    library_location: Path,
+    state: ExportState,
+) -> list[tuple[str, str, list[str]]]:
+    playlists: dict[str, list[str]] = {}
+    for playlist in get_metrics().timed(
+        "playlist_read", iter_playlists(library_location)
+    ):
+        playlists[playlist.name] = playlist_title_ids(playlist, library_location)
+    changes: list[tuple[str, str, list[str]]] = []
+    for name, titles in playlists.items():
+        previous_titles = state.playlists.get(name)
+        if previous_titles is None:
+            changes.append((name, "added", titles))
+        elif previous_titles != titles:
+            changes.append((name, "changed", titles))
+    for name in state.playlists:
+        if name not in playlists:
+            changes.append((name, "removed", []))
+    state.playlists = playlists
+    return changes
 
-    return playlists_dict
+
+def write_library_changes(
+    changes: list[tuple[str, str, ExportStateEntry]],
+    writer: ExportWriter,
+):
+    for key, change, entry in changes:
+        if change == "removed":
+            writer.write_entry(key, {"change": change, "path": entry.path})
+        else:
+            writer.write_entry(
+                key, {"change": change, "path": entry.path, **entry.tags}
+            )
+    writer.close()
+
+
+def write_playlist_changes(
+    changes: list[tuple[str, str, list[str]]],
+    writer: ExportWriter,
+):
+    for name, change, titles in changes:
+        if change == "removed":
+            writer.write_entry(name, {"change": change})
+        else:
+            writer.write_entry(name, {"change": change, "titles": titles})
+    writer.close()
+
+
+def write_library_snapshot(
+    state: ExportState,
+    writer: ExportWriter,
+):
+    for key, entry in state.titles.items():
+        writer.write_entry(key, {"path": entry.path, **entry.tags})
+    writer.close()
+
+
+def write_playlist_snapshot(
+    state: ExportState,
+    writer: ExportWriter,
+):
+    for name, titles in state.playlists.items():
+        writer.write_entry(name, {"titles": titles})
+    writer.close()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="only export titles and playlists added, changed or removed since the last delta export",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="export the full library and playlists keyed by stable title IDs",
+    )
+    add_instrumentation_arguments(parser, "export")
+
+
+def run(args: argparse.Namespace):
+    with instrumented(args):
+        if args.delta or args.snapshot:
+            _export_incremental(delta=args.delta, snapshot=args.snapshot)
+        else:
+            _export()
 
 
 def export():
+    parser = argparse.ArgumentParser(prog="export")
+    add_arguments(parser)
+    run(parser.parse_args())
+
+
+def _export():
+    library_config = get_config().library
+    export_config = get_config().export
+    writer_type = EXPORT_WRITERS[export_config.format]
+    if export_config.layout == "normalized":
+        library_writer = write_normalized_library
+        playlists_writer = write_normalized_playlists
+    else:
+        library_writer = write_library
+        playlists_writer = write_playlists
+
+    with get_metrics().stage("playlist_read"):
+        playlists = get_playlists(Path(library_config.location))
+    shared_paths: set[Path] = set()
+    if playlists_writer is write_playlists:
+        shared_paths = {
+            title.path for playlist in playlists for title in playlist.content
+        }
+
+    with MusicFile.indexed(Path(library_config.location)):
+        tag_reader = TagReader(jobs=export_config.jobs, shared_paths=shared_paths)
+        try:
+            with open(
+                Path(export_config.location) / Path("library" + writer_type.extension),
+                "wt",
+            ) as library_export_file:
+                library_writer(
+                    Path(library_config.location),
+                    tag_reader,
+                    writer_type(library_export_file),
+                    jobs=export_config.jobs,
+                )
+            with open(
+                Path(export_config.location)
+                / Path("playlists" + writer_type.extension),
+                "wt",
+            ) as playlists_export_file:
+                playlists_writer(
+                    Path(library_config.location),
+                    playlists,
+                    tag_reader,
+                    writer_type(playlists_export_file),
+                )
+        finally:
+            tag_reader.close()
+    for name in ("library", "playlists"):
+        export_path = Path(export_config.location) / Path(name + writer_type.extension)
+        get_metrics().add("bytes_out", export_path.stat().st_size)
+
+
+def _export_incremental(
+    delta: bool,
+    snapshot: bool,
+):
     library_config = get_config().library
     export_config = get_config().export
+    writer_type = EXPORT_WRITERS[export_config.format]
+    export_location = Path(export_config.location)
+    metrics = get_metrics()
 
-    library_dict = generate_library_dict(Path(library_config.location))
-    playlists_dict = generate_playlists_dict(Path(library_config.location))
+    state = ExportState.from_file(export_location)
+    with MusicFile.indexed(Path(library_config.location)):
+        tag_reader = TagReader(jobs=export_config.jobs)
+        try:
+            library_changes = update_library_state(
+                Path(library_config.location),
+                state,
+                tag_reader,
+                jobs=export_config.jobs,
+            )
+        finally:
+            tag_reader.close()
+    playlist_changes = update_playlist_state(Path(library_config.location), state)
+    for _, change, _ in library_changes:
+        metrics.add(f"titles_{change}")
+    for _, change, _ in playlist_changes:
+        metrics.add(f"playlists_{change}")
 
-    with open(
-        Path(export_config.location) / Path("library.json"), "wt"
-    ) as library_export_file:
-        library_export_file.write(
-            json.dumps(
-                obj=library_dict,
-                indent=2,
+    if library_changes or playlist_changes or snapshot:
+        state.sequence += 1
+    exports = []
+    if delta and (library_changes or playlist_changes):
+        exports.append(
+            (
+                f"library.delta.{str(state.sequence)}",
+                write_library_changes,
+                library_changes,
             )
         )
-    with open(
-        Path(export_config.location) / Path("playlists.json"), "wt"
-    ) as playlists_export_file:
-        playlists_export_file.write(
-            json.dumps(
-                obj=playlists_dict,
-                indent=2,
+        exports.append(
+            (
+                f"playlists.delta.{str(state.sequence)}",
+                write_playlist_changes,
+                playlist_changes,
+            )
+        )
+    if snapshot:
+        exports.append(
+            (f"library.snapshot.{str(state.sequence)}", write_library_snapshot, state)
+        )
+        exports.append(
+            (
+                f"playlists.snapshot.{str(state.sequence)}",
+                write_playlist_snapshot,
+                state,
             )
         )
+    for name, write, content in exports:
+        export_path = export_location / Path(name + writer_type.extension)
+        with open(export_path, "wt") as export_file:
+            with metrics.stage("write"):
+                write(content, writer_type(export_file))
+        metrics.add("bytes_out", export_path.stat().st_size)
+    state.save()
 
 
 if __name__ == "__main__":
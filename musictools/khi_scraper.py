@@ -1,14 +1,61 @@
-import requests
 import html
+import os
 import re
+import time
 from pathlib import Path
-from logging import Logger
+from typing import TYPE_CHECKING
 
+from musictools.common.utils.metrics import get_metrics
+from musictools.common.utils.page_cache import CachedPage, PageCache
+from musictools.common.utils.request_scheduler import RequestScheduler
 from musictools.config import get_config
 
+if TYPE_CHECKING:
+    import requests
+
+CHUNK_SIZE = 256 * 1024
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:140.0) Gecko/20100101 Firefox/140.0"
+}
+TITLE_ROW_PATTERN = re.compile(r'<td class="clickable-row"><a href="(.*)">.*</a></td>')
+ALBUM_TITLE_PATTERN = re.compile(r"<title>(.*) \(([0-9]*)\) MP3")
+DOWNLOAD_LINK_PATTERN = re.compile(
+    r'<a href="([^"]*(\.mp3|\.flac))"><span class="songDownloadLink"><i class="material-icons">'
+)
+
+
+class DownloadError(Exception): ...
+
+
+def _content_range_total(content_range: str | None) -> int | None:
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+def create_scheduler(jobs: int) -> RequestScheduler:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    download_config = get_config().download
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=jobs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return RequestScheduler(
+        session=session,
+        requests_per_second=download_config.requests_per_second,
+        max_concurrency=jobs,
+        max_retries=download_config.max_retries,
+        read_timeout=download_config.read_timeout,
+    )
+
 
 class KHIScraper:
     headers: dict[str, str]
+    session: "requests.Session"
     title_urls = [tuple[str, str]]
     album_name: str
     album_url: str
@@ -17,75 +64,144 @@ class KHIScraper:
     def __init__(
         self,
         album_url: str,
-        logger: Logger,
+        jobs: int = 1,
+        scheduler: RequestScheduler | None = None,
     ):
-        self.logger = logger
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:140.0) Gecko/20100101 Firefox/140.0"
-        }
+        self.headers = HEADERS
+        self.scheduler = scheduler or create_scheduler(jobs)
+        self.session = self.scheduler.session
+        download_config = get_config().download
+        self.page_cache = PageCache.open(Path(download_config.location))
+        self.page_cache_max_age = download_config.page_cache_max_age
         page = self._get_html(album_url)
-        self.title_urls = re.findall(
-            pattern=r'<td class="clickable-row"><a href="(.*)">.*</a></td>',
-            string=page,
-        )
-        self.album_name, self.year = re.findall(
-            pattern=r"<title>(.*) \(([0-9]*)\) MP3",
-            string=page,
-        )[0]
+        self.title_urls = TITLE_ROW_PATTERN.findall(page)
+        self.album_name, self.year = ALBUM_TITLE_PATTERN.findall(page)[0]
         self.album_url = album_url
 
     def _get_html(
         self,
         url: str,
     ) -> str:
-        page = requests.get(url=url, headers=self.headers)
+        cached_page = self.page_cache.get(url)
+        if cached_page and cached_page.is_fresh(self.page_cache_max_age):
+            return html.unescape(cached_page.text)
+
+        with get_metrics().stage("page_fetch"):
+            page = self.scheduler.get(
+                url=url,
+                headers=cached_page.validators() if cached_page else {},
+            )
+        if cached_page and page.status_code == 304:
+            cached_page.fetched_at = time.time()
+            self.page_cache.put(cached_page)
+            return html.unescape(cached_page.text)
+        page.raise_for_status()
         page.encoding = page.apparent_encoding
+        self.page_cache.put(
+            CachedPage(
+                url=url,
+                text=page.text,
+                etag=page.headers.get("ETag"),
+                last_modified=page.headers.get("Last-Modified"),
+                fetched_at=time.time(),
+            )
+        )
         return html.unescape(page.text)
 
-    def download(self):
-        download_config = get_config().download
-        download_path = Path(download_config.location) / Path(
+    def _resolve_file_url(
+        self,
+        url: str,
+        preferred_format: str,
+    ) -> tuple[str, str]:
+        title_page = self._get_html("https://downloads.khinsider.com" + url)
+        download_links: dict[str, str] = {}
+        for link, file_type in DOWNLOAD_LINK_PATTERN.findall(title_page):
+            download_links.setdefault(file_type, link)
+        if preferred_format == "lossless" and ".flac" in download_links:
+            return (download_links[".flac"], ".flac")
+        return (download_links[".mp3"], ".mp3")
+
+    def _fetch_file(
+        self,
+        file_url: str,
+        file_path: Path,
+    ):
+        part_path = file_path.with_name(file_path.name + ".part")
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={str(offset)}-"} if offset else {}
+        with self.scheduler.get(
+            url=file_url,
+            headers=headers,
+            stream=True,
+        ) as response:
+            if response.status_code == 416:
+                total = _content_range_total(response.headers.get("Content-Range"))
+                if total is None or total != offset:
+                    part_path.unlink()
+                    raise DownloadError(
+                        f"Partial file of {file_path.name} does not match the remote file"
+                    )
+                os.replace(part_path, file_path)
+                return
+            response.raise_for_status()
+            if response.status_code == 206:
+                expected_size = _content_range_total(
+                    response.headers.get("Content-Range")
+                )
+            else:
+                offset = 0
+                expected_size = None
+                if "Content-Length" in response.headers and not response.headers.get(
+                    "Content-Encoding"
+                ):
+                    expected_size = int(response.headers["Content-Length"])
+            metrics = get_metrics()
+            with (
+                metrics.stage("download"),
+                open(part_path, "ab" if offset else "wb") as file,
+            ):
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    file.write(chunk)
+                    metrics.add("bytes_in", len(chunk))
+
+        size = part_path.stat().st_size
+        if expected_size is not None and size != expected_size:
+            raise DownloadError(
+                f"Received {str(size)} of {str(expected_size)} bytes for {file_path.name}"
+            )
+        os.replace(part_path, file_path)
+
+    def download_path(self) -> Path:
+        download_path = Path(get_config().download.location) / Path(
             re.sub(r"(\\|\/|\:|\*|\?|\"|\<|\>|\|)", "", self.album_name)
         )
         if not download_path.exists() and not download_path.is_dir():
             download_path.mkdir()
+        return download_path
 
-        num_titles = len(self.title_urls)
-        i = 0
-
-        for url in self.title_urls:
-            i += 1
-            url = "https://downloads.khinsider.com" + url
-
-            title_page = self._get_html(url)
-            mp3_match = re.findall(
-                pattern=r'<a href="(.*).mp3"><span class="songDownloadLink"><i class="material-icons">',
-                string=title_page,
-            )
-            if mp3_match:
-                mp3_url = mp3_match[0] + ".mp3"
-            flac_match = re.findall(
-                pattern=r'<a href="(.*).flac"><span class="songDownloadLink"><i class="material-icons">',
-                string=title_page,
-            )
-            if flac_match:
-                flac_url = flac_match[0] + ".flac"
-            if download_config.preferred_format == "lossless" and flac_match:
-                file_type = ".flac"
-                file_url = flac_url
-            else:
-                file_type = ".mp3"
-                file_url = mp3_url
-            file_name = str(i) + file_type
-            file_path = download_path / file_name
-            if file_path.exists():
-                self.logger.info(
-                    f'[{str('{:3}'.format(i))}/{str(num_titles)}] Found existing file "{file_name}" skipping...'
-                )
-                continue
-            title_file = requests.get(url=file_url, headers=self.headers)
-            with open(file_path, "wb") as file:
-                file.write(title_file.content)
-            self.logger.info(
-                f'[{str('{:3}'.format(i))}/{str(num_titles)}] Downloaded "{file_name}"'
+    def download_title(
+        self,
+        i: int,
+        url: str,
+        download_path: Path,
+        preferred_format: str,
+    ) -> tuple[bool, str]:
+        preferred_type = ".flac" if preferred_format == "lossless" else ".mp3"
+        if (download_path / (str(i) + preferred_type)).exists():
+            return (
+                True,
+                f'Found existing file "{str(i) + preferred_type}" skipping...',
             )
+        start = time.perf_counter()
+        try:
+            with self.scheduler.slot():
+                file_url, file_type = self._resolve_file_url(url, preferred_format)
+                file_name = str(i) + file_type
+                file_path = download_path / file_name
+                if file_path.exists():
+                    return (True, f'Found existing file "{file_name}" skipping...')
+                self._fetch_file(file_url, file_path)
+        except Exception as e:
+            return (False, f"Failed to download title {str(i)}: {e}")
+        get_metrics().observe("title_seconds", time.perf_counter() - start)
+        return (True, f'Downloaded "{file_name}"')